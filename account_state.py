@@ -0,0 +1,204 @@
+import asyncio
+import math
+from collections import deque
+from datetime import datetime
+
+# -------- Trade Update Events --------
+# Events that end an order's life; anything else keeps it in open_orders
+TERMINAL_EVENTS = {"fill", "canceled", "expired", "rejected", "done_for_day", "replaced"}
+FILL_EVENTS = {"fill", "partial_fill"}
+MAX_FILLS = 500
+# client_order_id prefix of every order placed from a signal (see fanout.submit_to_account)
+SIGNAL_ORDER_PREFIX = "sig-"
+
+
+def as_dict(obj):
+    """alpaca_trade_api entities keep the API payload in _raw; stand-ins just pass dicts."""
+    return getattr(obj, "_raw", obj)
+
+
+def is_signal_order(order):
+    return (order.get("client_order_id") or "").startswith(SIGNAL_ORDER_PREFIX)
+
+
+def signed_qty(order, qty):
+    return float(qty or 0) * (1 if order["side"] == "buy" else -1)
+
+
+class AccountState:
+    """
+    Positions, open orders and recent fills for one account, held in memory.
+    Seeded once from REST, then kept current by apply() for each trade update,
+    so exits can be sized without asking Alpaca. `signal_orders` holds the
+    cumulative fills of our own signal orders, which bound what an exit may sell.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.positions = {}
+        # Order id → (symbol, signed cumulative filled qty); cumulative, so replays can't double count
+        self.signal_orders = {}
+        self.open_orders = {}
+        # Ids of finished orders, so a late "new" (e.g. our own submit echo) can't resurrect them
+        self.closed_orders = set()
+        self.fills = deque(maxlen=MAX_FILLS)
+        self.seeded = False
+        # Updates that arrive before the seed, replayed on top of it
+        self.pending = []
+        self.updated_at = None
+
+    def seed(self, positions, open_orders, closed_orders=()):
+        """
+        Load the REST snapshot, then replay any updates buffered while it was in
+        flight. Signal holdings come from the filled quantities of our own
+        orders; orders older than `closed_orders` reaches are not counted, which
+        can only make an exit sell less.
+        """
+        self.positions = {p["symbol"]: float(p["qty"]) for p in map(as_dict, positions)}
+        self.open_orders = {o["id"]: o for o in map(as_dict, open_orders)}
+        self.closed_orders = set()
+        self.signal_orders = {}
+        for o in list(self.open_orders.values()) + list(map(as_dict, closed_orders)):
+            self._track_signal_fill(o)
+        self.seeded = True
+        pending, self.pending = self.pending, []
+        for update in pending:
+            self.apply(*update)
+        self.updated_at = datetime.now()
+
+    def _track_signal_fill(self, order):
+        if is_signal_order(order) and float(order.get("filled_qty") or 0):
+            self.signal_orders[order["id"]] = (order["symbol"], signed_qty(order, order["filled_qty"]))
+
+    def signal_held(self, symbol):
+        return sum(qty for s, qty in self.signal_orders.values() if s == symbol)
+
+    def apply(self, event, order, position_qty=None, price=None, qty=None, timestamp=None):
+        """Update from one trade_updates message."""
+        if not self.seeded:
+            self.pending.append((event, order, position_qty, price, qty, timestamp))
+            return
+        order = as_dict(order)
+        symbol = order["symbol"]
+        if event in TERMINAL_EVENTS:
+            self.open_orders.pop(order["id"], None)
+            self.closed_orders.add(order["id"])
+        elif order["id"] not in self.closed_orders:
+            self.open_orders[order["id"]] = order
+
+        if event in FILL_EVENTS:
+            self.fills.append({
+                "symbol": symbol,
+                "side": order["side"],
+                "qty": float(qty or 0),
+                "price": float(price or 0),
+                "order_id": order["id"],
+                "timestamp": timestamp,
+            })
+            if position_qty is not None:
+                # The stream reports the position after the fill, which beats summing fills ourselves
+                self.positions[symbol] = float(position_qty)
+            else:
+                self.positions[symbol] = self.positions.get(symbol, 0.0) + signed_qty(order, qty)
+            if self.positions[symbol] == 0:
+                del self.positions[symbol]
+            self._track_signal_fill(order)
+        self.updated_at = datetime.now()
+
+    def pending_sell_qty(self, symbol):
+        return sum(
+            float(o["qty"] or 0) - float(o.get("filled_qty") or 0)
+            for o in self.open_orders.values()
+            if o["symbol"] == symbol and o["side"] == "sell" and is_signal_order(o)
+        )
+
+    def exit_quantity(self, symbol):
+        """
+        Whole shares our signal orders bought in `symbol`, still held, and not
+        already being sold by an open signal order. Shares bought any other way are never touched.
+        """
+        symbol = symbol.upper()
+        held = min(self.signal_held(symbol), self.positions.get(symbol, 0.0))
+        return max(0, math.floor(held - self.pending_sell_qty(symbol)))
+
+    def describe(self):
+        held = ", ".join(f"{s} {q:g}" for s, q in sorted(self.positions.items())) or "flat"
+        return f"{self.name}: {held}; {len(self.open_orders)} open orders, {len(self.fills)} fills"
+
+
+# -------- Trade Update Streams --------
+class TradeUpdateStream:
+    """Delivers `on_update(event, order, position_qty, price, qty, timestamp)` on the caller's event loop."""
+
+    async def start(self, on_update):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+class AlpacaTradeUpdateStream(TradeUpdateStream):
+    """The account's trade_updates websocket, run as a task on the bot's event loop."""
+
+    def __init__(self, api_key, secret_key, base_url):
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.base_url = base_url
+        self.stream = None
+        self.task = None
+
+    async def start(self, on_update):
+        from alpaca_trade_api.stream import TradingStream
+
+        async def handle(update):
+            data = as_dict(update)
+            on_update(data["event"], data["order"], data.get("position_qty"),
+                      data.get("price"), data.get("qty"), data.get("timestamp"))
+
+        self.stream = TradingStream(self.api_key, self.secret_key, self.base_url)
+        self.stream.subscribe_trade_updates(handle)
+        self.task = asyncio.create_task(self.stream._run_forever())
+
+    async def stop(self):
+        if self.stream is not None:
+            await self.stream.stop_ws()
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
+class FakeTradeUpdateStream(TradeUpdateStream):
+    """Local stand-in for tests: emit() and fill() feed updates straight to the state."""
+
+    def __init__(self):
+        self.on_update = None
+        self._ids = 0
+
+    async def start(self, on_update):
+        self.on_update = on_update
+
+    def emit(self, event, order, position_qty=None, price=None, qty=None):
+        self.on_update(event, order, position_qty, price, qty, datetime.now().isoformat())
+
+    def fill(self, symbol, side, qty, price, position_qty=None, order_id=None, client_order_id=None):
+        """Report a complete fill of a new order (or of `order_id`); pass a sig- client_order_id for a signal order."""
+        if order_id is None:
+            self._ids += 1
+            order_id = f"fake-{self._ids}"
+        order = {"id": order_id, "client_order_id": client_order_id, "symbol": symbol, "side": side,
+                 "qty": str(qty), "filled_qty": str(qty)}
+        self.emit("fill", order, position_qty, price, qty)
+        return order
+
+
+async def track_account(state, stream, list_positions, list_open_orders, list_closed_orders):
+    """
+    Start `stream`, then seed `state` from REST. The stream is subscribed first
+    and its updates are buffered until the seed lands, then replayed on top of it.
+    """
+    await stream.start(state.apply)
+    positions, open_orders, closed_orders = await asyncio.gather(
+        list_positions(), list_open_orders(), list_closed_orders()
+    )
+    state.seed(positions, open_orders, closed_orders)
+    print(f"📒 Account state {state.describe()}")
@@ -2,13 +2,19 @@ import re
 import json
 from datetime import datetime, timedelta
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
 from parse_signals import start_parser_bot  # ← Added import for parser
+from model_router import routed_completion, routed_stream, strip_code_fences
+from ledger import TradeLedger
+from positions import position_key
+from jobs import job_pool, JobCancelled
 
 # Configuration
 CONFIG = {
     "output_channel_id": 1379132047783624717,
     "channel_dump_file": "full_channel_dump.txt",
+    "ledger_file": "trades.db",
     "channels": {
         "free": "live-signals-free",
         "1": "live-signals-tier-1",
@@ -48,6 +54,48 @@ def get_trading_days(mode, ref_date=None):
         ]
     return []
 
+ORPHAN_SEARCH_WORKERS = 2
+
+TRADE_KEYS = ("channel", "ticker", "entry", "exit", "status", "entry_time", "exit_time")
+PRICE_RE = re.compile(r"@\s*\$?\d")
+
+def validate_trade(trade):
+    """Schema check for one extracted trade."""
+    if not isinstance(trade, dict):
+        raise ValueError("trade is not a JSON object")
+    missing = [key for key in TRADE_KEYS if key not in trade]
+    if missing:
+        raise ValueError(f"trade missing {', '.join(missing)}")
+    if trade["status"] not in ("open", "closed"):
+        raise ValueError(f"unknown status {trade['status']!r}")
+    return trade
+
+def expects_trades(lines):
+    """Confidence check: lines quoting prices should yield at least one trade."""
+    return any(PRICE_RE.search(line) for line in lines)
+
+def make_trades_validator(lines):
+    """Schema check for extracted trades, plus the expects_trades confidence check."""
+    expected = expects_trades(lines)
+
+    def validate(content):
+        trades = json.loads(strip_code_fences(content))
+        if not isinstance(trades, list):
+            raise ValueError("reply is not a JSON array")
+        for trade in trades:
+            validate_trade(trade)
+        if expected and not trades:
+            raise ValueError("no trades extracted from lines quoting prices")
+        return trades
+
+    return validate
+
+def validate_summary_reply(content):
+    cleaned = strip_code_fences(content)
+    if "Total Trades:" not in cleaned:
+        raise ValueError("summary lost its totals line")
+    return cleaned
+
 def build_prompt_for_lines(lines, date_list):
     return f"""
 You are a trading assistant. Extract and match real trade signals from chat logs.
@@ -85,16 +133,16 @@ Chat Messages:
 def find_entry_in_channel(channel_lines, ticker, exit_time, channel, openai_client):
     try:
         prompt = build_prompt_for_lines(channel_lines, [])
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
+        trades = routed_completion(
+            openai_client,
+            "orphan_search",
             messages=[
                 {"role": "system", "content": "You are a trading assistant that processes signals from chat logs."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0
+            input_text="".join(channel_lines),
+            validate=make_trades_validator(channel_lines)
         )
-        cleaned_json = re.sub(r"^```(?:json)?|```$", "", response.choices[0].message.content.strip(), flags=re.MULTILINE).strip()
-        trades = json.loads(cleaned_json)
 
         fmt = "%Y-%m-%d %H:%M"
         dt_exit = datetime.strptime(exit_time, fmt)
@@ -138,15 +186,16 @@ Output:
 - Return the validated or corrected message as a string.
 """
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
+        return routed_completion(
+            openai_client,
+            "validate_summary",
             messages=[
                 {"role": "system", "content": "You are a trading assistant that validates trade summaries for accuracy."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0
+            input_text=full_message,
+            validate=validate_summary_reply
         )
-        return re.sub(r"^```(?:json)?|```$", "", response.choices[0].message.content.strip(), flags=re.MULTILINE).strip()
     except Exception as e:
         print(f"❌ Error validating summary: {e}")
         return full_message
@@ -164,30 +213,25 @@ def format_trade(trade):
             trade_str += f". Sold some at {exits_str} for a {pct} {emojis}"
         else:
             trade_str += f". Sold at {trade['exits'][0]} {mins} later for a {pct} {emojis}"
+    elif trade.get("mark") is not None:
+        pct_val = trade['percent_change']
+        pct = f"{pct_val}% unrealized gain" if pct_val >= 0 else f"{abs(pct_val)}% unrealized loss"
+        trade_str += f". Open, marked at ${trade['mark']:.2f} for a {pct}"
     return trade_str
 
-async def run_trade_summary(mode, message, openai_client):
-    # ─────────────────────────────────────────────────────────────────────────────
-    # FIRST THING: Run parse_signals.py when !data is invoked
-    #await message.channel.send("🔄 Running parse_signals.py...")
-    #try:
-    #    await start_parser_bot()
-    #    await message.channel.send("✅ `parse_signals.py` ran successfully.")
-    #except Exception as e:
-    #    await message.channel.send(f"❌ Exception occurred while running parser: {str(e)}")
-    #    return
-    # ─────────────────────────────────────────────────────────────────────────────
-
-    from discord import File
-    now = datetime.now()
-    date_list = get_trading_days(mode, now)
-    if not date_list and mode != "today":
-        await message.channel.send(f"❌ Invalid mode. Use `!data today`, `!data week`, or `!data month`.")
-        return
-
-    print(f"[Analytics] Starting trade summary for: {mode}")
-    await message.channel.send(f":inbox_tray: Collecting messages for `{mode}`...")
-
+def apply_marks(trade_details, marks):
+    """Copy live marks from the position tracker onto open trades."""
+    for t in trade_details:
+        if t["status"] != "open" or t["entry"] is None:
+            continue
+        mark = marks.get(position_key(t["channel"], t["ticker"], t["type"], t["entry"]))
+        if mark:
+            t["mark"] = mark["mark"]
+            t["percent_change"] = mark["pct"]
+            t["unrealized"] = mark["unrealized"]
+
+def extract_trade_details_llm(mode, now, date_list, openai_client, progress):
+    """Re-extract trades for date_list from the channel dump with the LLM. Returns (trade_details, wins, losses, opens)."""
     # 1) Read full channel dump (all timestamps), store by tier.
     channel_lines = defaultdict(list)
     try:
@@ -198,11 +242,11 @@ async def run_trade_summary(mode, message, openai_client):
                         channel_lines[tier].append(line)
                         break
     except FileNotFoundError:
-        await message.channel.send("❌ Error: Channel dump file not found.")
-        return
+        progress("❌ Error: Channel dump file not found.")
+        return None
     except Exception as e:
-        await message.channel.send(f"❌ Error reading channel dump: {str(e)}")
-        return
+        progress(f"❌ Error reading channel dump: {str(e)}")
+        return None
 
     # 2) Filter just the lines that mention any date in our week/month,
     #    so we can send those to the LLM to extract trades.
@@ -216,7 +260,7 @@ async def run_trade_summary(mode, message, openai_client):
     with open(output_filename, "w", encoding="utf-8") as f:
         f.writelines(filtered_lines)
 
-    await message.channel.send("📊 Parsing signals by tier...")
+    progress("📊 Parsing signals by tier...")
 
     # 3) For each tier, keep only those lines in date_list (this is what we feed to the LLM)
     tiered_lines = {
@@ -248,73 +292,101 @@ async def run_trade_summary(mode, message, openai_client):
         tiered_lines[tier] = normalized
     # ─────────────────────────────────────────────────────────────────────────────
 
-    all_trades = []
-    for i, (tier, lines) in enumerate(tiered_lines.items(), start=1):
-        if not lines:
-            continue
-        print(f"[Step {i}] Prompting Tier {tier}...")
-        await message.channel.send(f":robot: Prompting Tier {tier}...")
-        prompt = build_prompt_for_lines(lines, date_list)
-        try:
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a trading assistant that processes signals from chat logs."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0
-            )
-            cleaned_json = re.sub(r"^```(?:json)?|```$", "", response.choices[0].message.content.strip(), flags=re.MULTILINE).strip()
-            trades = json.loads(cleaned_json)
-            print(trades)
-
-            # *** FIX #1: Summary‐flagging now uses exit_date for closed trades ***
-            for trade in trades:
-                entry_day = trade["entry_time"].split()[0] if trade["entry_time"] else None
-                exit_day  = trade["exit_time"].split()[0] if trade["exit_time"] else None
-
-                if trade["status"] == "closed":
-                    trade["summary"] = "yes" if exit_day in date_list else "no"
-                elif trade["status"] == "open":
-                    trade["summary"] = "yes"
-                else:
-                    trade["summary"] = "yes" if entry_day in date_list else "no"
-
-            all_trades.extend(trades)
-        except Exception as e:
-            print(f"❌ Error parsing tier {tier}: {e}")
+    # 6) Group by (channel, ticker, entry_time) so that partial exits merge into one trade.
+    #    Trades are flagged, and orphans' back-searches started, as the model streams them;
+    #    grouping waits for the searches so trades keep their streamed order.
+    grouped_trades = defaultdict(list)
+    accepted = []
+    # Back-searches are blocking completions, so they run beside the stream instead of stalling it
+    orphan_pool = ThreadPoolExecutor(max_workers=ORPHAN_SEARCH_WORKERS, thread_name_prefix="orphan-search")
+
+    def group(trade):
+        # 5) Keep exactly those trades whose “relevant date” sits in date_list
+        if trade.get("summary") == "yes":
+            grouped_trades[(trade["channel"], trade["ticker"], trade["entry_time"])].append(trade)
+
+    def accept(trade):
+        # *** FIX #1: Summary‐flagging now uses exit_date for closed trades ***
+        entry_day = trade["entry_time"].split()[0] if trade["entry_time"] else None
+        exit_day  = trade["exit_time"].split()[0] if trade["exit_time"] else None
+
+        if trade["status"] == "closed":
+            trade["summary"] = "yes" if exit_day in date_list else "no"
+        elif trade["status"] == "open":
+            trade["summary"] = "yes"
+        else:
+            trade["summary"] = "yes" if entry_day in date_list else "no"
 
-    # 4) For each closed trade with no entry (or summary=="no" but exit_in_week),
-    #    do an “extra search” over the FULL channel dump (all dates).
-    for trade in all_trades:
+        # 4) For each closed trade with no entry (or summary=="no" but exit_in_week),
+        #    do an “extra search” over the FULL channel dump (all dates).
         if trade["status"] == "closed" and trade["exit_time"] and (not trade["entry_time"] or trade["summary"] == "no"):
             channel = trade["channel"]
             ticker = trade["ticker"]
             exit_time = trade["exit_time"]
-            print(f"[Extra Search] Looking for entry for {ticker} in {channel} before {exit_time}")
-            await message.channel.send(f":mag_right: Looking for entry for {ticker} in {channel} before {exit_time}")
             tier = next((t for t, c in CONFIG["channels"].items() if c == channel), None)
             if tier:
-                entry_trade = find_entry_in_channel(channel_lines[tier], ticker, exit_time, channel, openai_client)
-                if entry_trade and entry_trade["entry"] and entry_trade["entry_time"]:
-                    # *** FIX #2: No longer require entry_day ∈ date_list ***
-                    trade["entry"] = entry_trade["entry"]
-                    trade["entry_time"] = entry_trade["entry_time"]
-                    # We already know exit_day is in date_list (otherwise summary would be "no" earlier)
-                    trade["summary"] = "yes"
-                    trade["type"]   = entry_trade["type"]   or trade["type"]
-                    trade["expiry"] = entry_trade["expiry"] or trade["expiry"]
-                else:
-                    print(f"⚠️ Warning: entry missing for {ticker} closed at {exit_time}. Skipping.")
-
-    # 5) Keep exactly those trades whose “relevant date” sits in date_list
-    summary_trades = [t for t in all_trades if t.get("summary") == "yes"]
+                print(f"[Extra Search] Looking for entry for {ticker} in {channel} before {exit_time}")
+                progress(f":mag_right: Looking for entry for {ticker} in {channel} before {exit_time}")
+                accepted.append((trade, orphan_pool.submit(
+                    find_entry_in_channel, channel_lines[tier], ticker, exit_time, channel, openai_client
+                )))
+                return
+        accepted.append((trade, None))
+
+    def resolve(trade, entry_trade):
+        if entry_trade and entry_trade["entry"] and entry_trade["entry_time"]:
+            # *** FIX #2: No longer require entry_day ∈ date_list ***
+            trade["entry"] = entry_trade["entry"]
+            trade["entry_time"] = entry_trade["entry_time"]
+            # We already know exit_day is in date_list (otherwise summary would be "no" earlier)
+            trade["summary"] = "yes"
+            trade["type"]   = entry_trade["type"]   or trade["type"]
+            trade["expiry"] = entry_trade["expiry"] or trade["expiry"]
+        else:
+            print(f"⚠️ Warning: entry missing for {trade['ticker']} closed at {trade['exit_time']}. Skipping.")
+        group(trade)
 
-    # 6) Group by (channel, ticker, entry_time) so that partial exits merge into one trade
-    grouped_trades = defaultdict(list)
-    for trade in summary_trades:
-        key = (trade["channel"], trade["ticker"], trade["entry_time"])
-        grouped_trades[key].append(trade)
+    try:
+        for i, (tier, lines) in enumerate(tiered_lines.items(), start=1):
+            if not lines:
+                continue
+            print(f"[Step {i}] Prompting Tier {tier}...")
+            progress(f":robot: Prompting Tier {tier}...")
+            prompt = build_prompt_for_lines(lines, date_list)
+            received = 0
+            try:
+                # Each trade is handled as soon as its object closes; if the stream is
+                # cut off, the trades already received are kept
+                for trade in routed_stream(
+                    openai_client,
+                    "tier_extract",
+                    messages=[
+                        {"role": "system", "content": "You are a trading assistant that processes signals from chat logs."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    input_text="".join(lines),
+                    validate_item=validate_trade,
+                    require_items=expects_trades(lines)
+                ):
+                    print(trade)
+                    received += 1
+                    accept(trade)
+            except JobCancelled:
+                raise
+            except Exception as e:
+                print(f"❌ Error parsing tier {tier} after {received} trades: {e}")
+
+        searches = sum(1 for _, future in accepted if future)
+        if searches:
+            progress(f":hourglass: Waiting on {searches} entry back-searches...")
+        # find_entry_in_channel returns None on failure, so result() never raises
+        for trade, future in accepted:
+            if future:
+                resolve(trade, future.result())
+            else:
+                group(trade)
+    finally:
+        orphan_pool.shutdown(wait=False, cancel_futures=True)
 
     trade_details = []
     win_count = loss_count = open_count = 0
@@ -388,6 +460,84 @@ async def run_trade_summary(mode, message, openai_client):
         except Exception as e:
             print(f"⚠️ Skipping grouped trade due to error: {e}")
 
+    return trade_details, win_count, loss_count, open_count
+
+def collect_trade_details_ledger(date_list):
+    """Build trade details for date_list from the trade ledger. Returns (trade_details, wins, losses, opens)."""
+    trade_details = []
+    win_count = loss_count = open_count = 0
+    if not date_list:
+        return trade_details, win_count, loss_count, open_count
+
+    ledger = TradeLedger(CONFIG["ledger_file"])
+    try:
+        trades = ledger.trades_for_dates(min(date_list), max(date_list))
+    finally:
+        ledger.close()
+
+    # List tiers in CONFIG order, like the per-tier LLM extraction does
+    tier_order = {channel: i for i, channel in enumerate(CONFIG["channels"].values())}
+    trades.sort(key=lambda t: (tier_order.get(t["channel"], len(tier_order)), t["entry_time"]))
+
+    fmt = "%Y-%m-%d %H:%M"
+    for trade in trades:
+        if not trade["entry"]:
+            continue
+        entry_price = trade["entry"]
+        channel = trade["channel"]
+        if trade["exits"]:
+            dt_entry = datetime.strptime(trade["entry_time"], fmt)
+            exits = [
+                {
+                    "exit": e["price"],
+                    "change": ((e["price"] - entry_price) / entry_price) * 100,
+                    "duration": int((datetime.strptime(e["exit_time"], fmt) - dt_entry).total_seconds() / 60),
+                    "exit_date": e["exit_time"].split()[0]
+                }
+                for e in trade["exits"]
+            ]
+            trade_date = exits[-1]["exit_date"]
+            if trade_date not in date_list:
+                continue
+            avg_change   = sum(e["change"] for e in exits) / len(exits)
+            avg_duration = sum(e["duration"] for e in exits) / len(exits)
+            trade_details.append({
+                "channel": channel,
+                "ticker": trade["ticker"],
+                "type": trade["type"],
+                "entry": entry_price,
+                "percent_change": round(avg_change, 2),
+                "duration": f"{int(avg_duration)}m",
+                "status": "closed",
+                "partial": len(exits) > 1,
+                "exits": [f"${e['exit']}" for e in exits],
+                "trade_date": trade_date
+            })
+            if avg_change > 0:
+                win_count += 1
+            else:
+                loss_count += 1
+        else:
+            entry_date = trade["entry_time"].split()[0]
+            if entry_date not in date_list:
+                continue
+            trade_details.append({
+                "channel": channel,
+                "ticker": trade["ticker"],
+                "type": trade["type"],
+                "entry": entry_price,
+                "percent_change": 0.0,
+                "duration": "0m",
+                "status": "open",
+                "partial": False,
+                "exits": [],
+                "trade_date": entry_date
+            })
+            open_count += 1
+
+    return trade_details, win_count, loss_count, open_count
+
+def build_summary_message(mode, now, date_list, trade_details, win_count, loss_count, open_count):
     # 7) Compute aggregates
     closed_trades = [t for t in trade_details if t["status"] == "closed"]
 
@@ -496,6 +646,11 @@ async def run_trade_summary(mode, message, openai_client):
                 full_message += format_trade(t) + "\n"
             full_message += "\n"
 
+        marked = [t for t in trade_details if t.get("mark") is not None]
+        if marked and not is_monthly:
+            open_pnl = sum(t["unrealized"] for t in marked)
+            full_message += f"Open P&L right now (1 contract each): ${open_pnl:,.2f} across {len(marked)} marked {'position' if len(marked) == 1 else 'positions'}\n\n"
+
         if is_monthly:
             profit_cents = int(total_profit * 100)
             full_message += f"If you bought one contract for each trade this month, you would've made ${profit_cents}\n\n"
@@ -504,7 +659,81 @@ async def run_trade_summary(mode, message, openai_client):
         ":closed_lock_with_key: Want to see our open trades? "
         "[Get a premium membership!](https://discord.com/channels/1350549258310385694/1372399067514011749)\n"
     )
-    full_message = check_summary_for_inconsistencies(full_message, open_count, trade_details, openai_client)
+
+    return full_message
+
+def compute_trade_summary(mode, now, source="ledger", openai_key=None, progress=print, marks=None):
+    """
+    Build the summary text for `mode`. Runs in a job_pool worker process, so
+    it only reports through `progress` and returns None on failure. `marks`
+    is a PositionTracker.marks() snapshot used to show open P&L.
+    """
+    date_list = get_trading_days(mode, now)
+    if not date_list and mode != "today":
+        progress(f"❌ Invalid mode. Use `!data today`, `!data week`, or `!data month`.")
+        return None
+
+    print(f"[Analytics] Starting trade summary for: {mode}")
+    progress(f":inbox_tray: Collecting messages for `{mode}`...")
+
+    if source == "llm":
+        # Full re-extraction from the channel dump, kept for auditing the ledger.
+        # Clients hold sockets and locks, so the worker builds its own.
+        from openai import OpenAI
+        openai_client = OpenAI(api_key=openai_key, max_retries=0)
+        result = extract_trade_details_llm(mode, now, date_list, openai_client, progress)
+        if result is None:
+            return None
+    else:
+        result = collect_trade_details_ledger(date_list)
+    trade_details, win_count, loss_count, open_count = result
+    if marks:
+        apply_marks(trade_details, marks)
+
+    full_message = build_summary_message(mode, now, date_list, *result)
+    if source == "llm":
+        progress(":mag: Validating summary...")
+        full_message = check_summary_for_inconsistencies(full_message, open_count, trade_details, openai_client)
+    return full_message
+
+async def run_trade_summary(mode, message, openai_key, source="ledger", marks=None):
+    # ─────────────────────────────────────────────────────────────────────────────
+    # FIRST THING: Run parse_signals.py when !data is invoked
+    #await message.channel.send("🔄 Running parse_signals.py...")
+    #try:
+    #    await start_parser_bot()
+    #    await message.channel.send("✅ `parse_signals.py` ran successfully.")
+    #except Exception as e:
+    #    await message.channel.send(f"❌ Exception occurred while running parser: {str(e)}")
+    #    return
+    # ─────────────────────────────────────────────────────────────────────────────
+
+    # The summary runs in a worker process so the event loop stays free for
+    # !push, !kill and the Discord heartbeat while it scans and aggregates.
+    def announce(job):
+        asyncio.create_task(message.channel.send(f":gear: Job #{job.id} queued for `!data {mode}` (`!cancel {job.id}` to stop)"))
+
+    try:
+        full_message = await job_pool.run(
+            f"!data {mode}",
+            compute_trade_summary,
+            mode,
+            datetime.now(),
+            source,
+            openai_key,
+            on_progress=message.channel.send,
+            on_submit=announce,
+            marks=marks
+        )
+    except JobCancelled:
+        await message.channel.send(f"🛑 `!data {mode}` was cancelled.")
+        return None
+    except Exception as e:
+        print(f"❌ Trade summary job failed: {e}")
+        await message.channel.send(f"❌ Error building `{mode}` summary: {str(e)}")
+        return None
+    if full_message is None:
+        return None
 
     if output_channel := message.guild.get_channel(CONFIG["output_channel_id"]):
         await output_channel.send(full_message)
@@ -0,0 +1,336 @@
+import argparse
+import bisect
+import itertools
+import json
+import math
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from ledger import TradeLedger, normalize_channel, LEDGER_FILE, TIME_FMT
+from positions import occ_symbol
+
+# -------- Inline Secrets --------
+# Only needed for `--build-prices`, which pulls historical option bars from Alpaca
+ALPACA_API_KEY = ""
+ALPACA_SECRET_KEY = ""
+
+# -------- Configuration --------
+PRICE_FIXTURE_FILE = "option_prices.json"
+# Bars fetched past the last exit, so every delay in DEFAULT_SWEEP finds a quote
+FIXTURE_PADDING_MINUTES = 15
+RESULTS_FILE = "backtest_results.json"
+
+DEFAULT_PARAMS = {
+    "starting_cash": 2000.0,
+    "sizing": "fixed",            # "fixed": `contracts` per trade, "percent": `risk_fraction` of equity
+    "contracts": 1,
+    "risk_fraction": 0.05,
+    "fill_delay_minutes": 1,      # time from the signal to our fill
+    "slippage_pct": 2.0,          # paid on both the buy and the sell
+    "fee_per_contract": 0.65,     # per side
+    "tiers": None,                # e.g. ["live-signals-tier-1"]; None follows every channel
+}
+
+# Used by `python backtest.py --sweep`
+DEFAULT_SWEEP = {
+    "fill_delay_minutes": [0, 1, 3],
+    "slippage_pct": [0.0, 2.0, 5.0],
+    "sizing": ["fixed", "percent"],
+}
+
+
+# -------- Price Fixture --------
+def contract_key(ticker, expiry, strike, kind):
+    """"SPY 2025-06-06 599P": the key format used in the price fixture."""
+    return f"{ticker} {expiry} {strike:g}{'C' if kind == 'call' else 'P'}"
+
+
+def trade_contract(trade):
+    """(ticker, expiry, strike, type) for a ledger trade; undated signals are same-day contracts."""
+    return trade["ticker"], trade["expiry"] or trade["entry_time"].split()[0], trade["strike"] or 0, trade["type"]
+
+
+def load_price_fixture(path=PRICE_FIXTURE_FILE):
+    """
+    Load option quotes from a local JSON fixture shaped like
+    {"SPY 2025-06-06 599P": [["2025-06-06 10:24", 0.97], ...], ...}.
+    Returns {} when the fixture does not exist.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    fixture = {}
+    for key, quotes in raw.items():
+        quotes = sorted(quotes)
+        fixture[key] = ([q[0] for q in quotes], [float(q[1]) for q in quotes])
+    return fixture
+
+
+def price_at(fixture, key, when):
+    """Last fixture quote at or before `when`, or None if the contract has no quote by then."""
+    series = fixture.get(key)
+    if not series:
+        return None
+    times, prices = series
+    i = bisect.bisect_right(times, when) - 1
+    return prices[i] if i >= 0 else None
+
+
+def build_price_fixture(trades, api_key, secret_key, path=PRICE_FIXTURE_FILE):
+    """
+    Fetch 1-minute Alpaca option bars (closes) spanning each closed trade and
+    write them as a price fixture. Returns the number of contracts quoted.
+    """
+    # alpaca-py has the historical options API; alpaca_trade_api does not
+    from alpaca.data.historical.option import OptionHistoricalDataClient
+    from alpaca.data.requests import OptionBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
+    data_client = OptionHistoricalDataClient(api_key, secret_key)
+    quotes = defaultdict(dict)
+    for trade in trades:
+        if trade["status"] != "closed" or not trade["entry"] or not trade["exits"]:
+            continue
+        ticker, expiry, strike, kind = trade_contract(trade)
+        symbol = occ_symbol(ticker, expiry, strike, kind)
+        if symbol is None:
+            continue
+        # Ledger times are the bot's local time, which is what astimezone() assumes for naive datetimes
+        start = datetime.strptime(trade["entry_time"], TIME_FMT).astimezone()
+        end = (datetime.strptime(trade["exits"][-1]["exit_time"], TIME_FMT)
+               + timedelta(minutes=FIXTURE_PADDING_MINUTES)).astimezone()
+        try:
+            bars = data_client.get_option_bars(OptionBarsRequest(
+                symbol_or_symbols=symbol, timeframe=TimeFrame.Minute, start=start, end=end
+            ))
+        except Exception as e:
+            print(f"⚠️ No bars for {symbol}: {e}")
+            continue
+        key = contract_key(ticker, expiry, strike, kind)
+        for bar in bars.data.get(symbol, []):
+            quotes[key][bar.timestamp.astimezone().strftime(TIME_FMT)] = bar.close
+
+    fixture = {key: sorted(series.items()) for key, series in quotes.items() if series}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, indent=1)
+    return len(fixture)
+
+
+def fixture_coverage(trades, fixture):
+    """How many closed trades have any quotes in the fixture."""
+    return sum(
+        1 for trade in trades
+        if trade["status"] == "closed" and contract_key(*trade_contract(trade)) in fixture
+    )
+
+
+# -------- Replay --------
+def build_events(trades, tiers=None):
+    """Flatten ledger trades into time-ordered (time, order, kind, trade, exit_index) events."""
+    events = []
+    for trade in trades:
+        channel = normalize_channel(trade["channel"])
+        if tiers and channel not in tiers:
+            continue
+        # Open trades with a partial exit still hold runners; only finished trades are replayed
+        if trade["status"] != "closed" or not trade["entry"] or not trade["exits"]:
+            continue
+        events.append((trade["entry_time"], 0, "entry", trade, None))
+        for i, e in enumerate(trade["exits"]):
+            events.append((e["exit_time"], 1, "exit", trade, i))
+    events.sort(key=lambda ev: (ev[0], ev[1], ev[3]["id"]))
+    return events
+
+
+def shift(timestamp, minutes):
+    return (datetime.strptime(timestamp, TIME_FMT) + timedelta(minutes=minutes)).strftime(TIME_FMT)
+
+
+def fill_price(fixture, trade, signal_time, signal_price, params, side):
+    """Fixture quote after the fill delay (or the signal price if unquoted), with slippage against us."""
+    key = contract_key(*trade_contract(trade))
+    quoted = price_at(fixture, key, shift(signal_time, params["fill_delay_minutes"]))
+    base = quoted if quoted is not None else signal_price
+    slip = params["slippage_pct"] / 100
+    return (base * (1 + slip) if side == "buy" else base * (1 - slip)), quoted is not None
+
+
+def max_drawdown(curve):
+    peak = -math.inf
+    worst = 0.0
+    for _, equity in curve:
+        peak = max(peak, equity)
+        worst = min(worst, equity - peak)
+    return -worst
+
+
+def run_backtest(trades, params=None, fixture=None):
+    """
+    Replay ledger trades as if every signal were followed.
+
+    Returns {"params", "metrics", "tiers", "equity_curve"}; the curve holds
+    (time, equity) after each fill, with open positions carried at cost.
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    fixture = fixture or {}
+    cash = params["starting_cash"]
+    fee = params["fee_per_contract"]
+    positions = {}
+    curve = [(None, cash)]
+    tier_pnl = defaultdict(list)
+    tier_curve = defaultdict(lambda: [(None, 0.0)])
+    priced = unpriced = skipped = 0
+
+    for when, _, kind, trade, exit_index in build_events(trades, params["tiers"]):
+        if kind == "entry":
+            price, was_quoted = fill_price(fixture, trade, when, trade["entry"], params, "buy")
+            if params["sizing"] == "percent":
+                equity = cash + sum(p["cost"] for p in positions.values())
+                qty = int(equity * params["risk_fraction"] // (price * 100 + fee)) if price > 0 else 0
+            else:
+                qty = params["contracts"]
+            cost = qty * (price * 100 + fee)
+            if qty <= 0 or cost > cash:
+                skipped += 1
+                continue
+            cash -= cost
+            positions[trade["id"]] = {"qty": qty, "cost": cost, "proceeds": 0.0}
+            priced += was_quoted
+            unpriced += not was_quoted
+        else:
+            position = positions.get(trade["id"])
+            if position is None:
+                continue
+            exits_left = len(trade["exits"]) - exit_index
+            # Partial exits sell an even share of what is left; the last exit sells the rest
+            qty = math.ceil(position["qty"] / exits_left)
+            price, was_quoted = fill_price(fixture, trade, when, trade["exits"][exit_index]["price"], params, "sell")
+            proceeds = qty * (price * 100 - fee)
+            cash += proceeds
+            position["qty"] -= qty
+            position["proceeds"] += proceeds
+            priced += was_quoted
+            unpriced += not was_quoted
+            if position["qty"] == 0:
+                del positions[trade["id"]]
+                channel = normalize_channel(trade["channel"])
+                pnl = position["proceeds"] - position["cost"]
+                tier_pnl[channel].append((pnl, position["cost"]))
+                tier_curve[channel].append((when, tier_curve[channel][-1][1] + pnl))
+        curve.append((when, cash + sum(p["cost"] for p in positions.values())))
+
+    tiers = {}
+    for channel, results in sorted(tier_pnl.items()):
+        wins = [pnl for pnl, _ in results if pnl > 0]
+        losses = [pnl for pnl, _ in results if pnl <= 0]
+        tiers[channel] = {
+            "trades": len(results),
+            "win_rate": round(len(wins) / len(results) * 100, 2),
+            "pnl": round(sum(pnl for pnl, _ in results), 2),
+            "avg_return_pct": round(sum(pnl / cost * 100 for pnl, cost in results) / len(results), 2),
+            "profit_factor": round(sum(wins) / -sum(losses), 2) if losses and sum(losses) < 0 else None,
+            "max_drawdown": round(max_drawdown(tier_curve[channel]), 2),
+        }
+
+    final_equity = curve[-1][1]
+    metrics = {
+        "final_equity": round(final_equity, 2),
+        "return_pct": round((final_equity / params["starting_cash"] - 1) * 100, 2),
+        "max_drawdown": round(max_drawdown(curve), 2),
+        "trades": sum(t["trades"] for t in tiers.values()),
+        "skipped_for_cash": skipped,
+        "still_open": len(positions),
+        "fills_from_fixture": priced,
+        "fills_from_signal_price": unpriced,
+    }
+    return {"params": params, "metrics": metrics, "tiers": tiers, "equity_curve": curve[1:]}
+
+
+# -------- Parameter Sweeps --------
+_worker_trades = None
+_worker_fixture = None
+
+
+def _init_worker(trades, fixture):
+    # Ship trades and quotes to each worker once instead of once per parameter set
+    global _worker_trades, _worker_fixture
+    _worker_trades = trades
+    _worker_fixture = fixture
+
+
+def _run_in_worker(params):
+    return run_backtest(_worker_trades, params, _worker_fixture)
+
+
+def expand_grid(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def run_sweep(trades, grid, fixture=None, base_params=None, max_workers=None):
+    """Run one backtest per combination in `grid`, spread across worker processes."""
+    delays = grid.get("fill_delay_minutes", [])
+    if len(delays) > 1 and not fixture_coverage(trades, fixture or {}):
+        # Delays only change which fixture quote is used; without quotes every delay gives the same run
+        print(f"⚠️ No fixture quotes for any trade, so fill_delay_minutes {delays} cannot matter; "
+              f"sweeping {delays[0]} only (build quotes with --build-prices)")
+        grid = {**grid, "fill_delay_minutes": delays[:1]}
+    combos = [{**(base_params or {}), **combo} for combo in expand_grid(grid)]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(trades, fixture or {})) as pool:
+        return list(pool.map(_run_in_worker, combos))
+
+
+def load_trades(ledger_file=LEDGER_FILE):
+    ledger = TradeLedger(ledger_file)
+    try:
+        return ledger.all_trades()
+    finally:
+        ledger.close()
+
+
+def print_result(result):
+    changed = {k: v for k, v in result["params"].items() if DEFAULT_PARAMS.get(k) != v}
+    m = result["metrics"]
+    print(f"📈 {changed or 'defaults'}: equity ${m['final_equity']:,.2f} ({m['return_pct']}%), "
+          f"max DD ${m['max_drawdown']:,.2f}, {m['trades']} trades, {m['skipped_for_cash']} skipped")
+    for channel, t in result["tiers"].items():
+        print(f"    {channel}: {t['trades']} trades, {t['win_rate']}% wins, P&L ${t['pnl']:,.2f}, "
+              f"avg {t['avg_return_pct']}%, PF {t['profit_factor']}, DD ${t['max_drawdown']:,.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest following the signal channels from the trade ledger.")
+    parser.add_argument("--sweep", action="store_true", help="run DEFAULT_SWEEP in parallel")
+    parser.add_argument("--build-prices", action="store_true",
+                        help="fetch Alpaca option bars for the ledger's trades into --prices, then exit")
+    parser.add_argument("--tier", action="append", help="only follow this channel (repeatable)")
+    parser.add_argument("--ledger", default=LEDGER_FILE)
+    parser.add_argument("--prices", default=PRICE_FIXTURE_FILE)
+    parser.add_argument("--out", default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    trades = load_trades(args.ledger)
+    if args.build_prices:
+        count = build_price_fixture(trades, ALPACA_API_KEY, ALPACA_SECRET_KEY, args.prices)
+        print(f"✅ Wrote quotes for {count} contracts to {args.prices}")
+        raise SystemExit(0)
+
+    fixture = load_price_fixture(args.prices)
+    if not fixture:
+        print(f"⚠️ No price fixture at {args.prices}; filling at signal prices plus slippage "
+              f"(run with --build-prices to fetch one)")
+    base = {"tiers": args.tier} if args.tier else {}
+
+    if args.sweep:
+        results = run_sweep(trades, DEFAULT_SWEEP, fixture, base)
+    else:
+        results = [run_backtest(trades, base, fixture)]
+    for result in results:
+        print_result(result)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Wrote {len(results)} result(s) with equity curves to {args.out}")
@@ -1,24 +1,48 @@
 import discord
 import asyncio
-from openai import OpenAI
 from datetime import datetime, timedelta
 import pytz
 import re
-from analytics import run_trade_summary
+import os
+from analytics import run_trade_summary, CONFIG
+from jobs import job_pool
+from trade_table import build_stats_message, GROUP_BY
 from parse_signals import start_parser_bot
+from ledger import TradeLedger, normalize_channel
+from positions import PositionTracker, AlpacaQuoteStream, FakeQuoteFeed
 
 DISCORD_TOKEN = ""
 OPENAI_KEY = ""
+ALPACA_API_KEY = ""
+ALPACA_SECRET_KEY = ""
+
+# "alpaca" streams option quotes; "fake" runs a local random walk for trying !positions offline
+QUOTE_FEED = "alpaca"
 
 CHANNEL_ID_TRIGGER = 1379132047783624717
 CHANNEL_ID_SECONDARY_OUTPUT = 1379132006629118113
 CHANNEL_ID_TERTIARY_OUTPUT = 1379815950588842105  # ← replace with your live output channel ID
 
 client = discord.Client(intents=discord.Intents.all())
-openai_client = OpenAI(api_key=OPENAI_KEY)
 
 last_summary_message = ""
 
+# Every message in the signal channels is recorded here as it arrives
+ledger = TradeLedger(CONFIG["ledger_file"])
+SIGNAL_CHANNELS = set(CONFIG["channels"].values())
+
+# Live marks for open positions, fed by a quote stream rather than REST polling
+quote_stream = AlpacaQuoteStream(ALPACA_API_KEY, ALPACA_SECRET_KEY) if QUOTE_FEED == "alpaca" else FakeQuoteFeed()
+positions = PositionTracker(quote_stream, CONFIG["ledger_file"])
+
+def ingest_channel_dump():
+    """Load any messages from the channel dump that the ledger has not seen yet."""
+    if not os.path.exists(CONFIG["channel_dump_file"]):
+        return 0
+    added = ledger.ingest_dump(CONFIG["channel_dump_file"])
+    print(f"📒 Ledger: {added} new messages from {CONFIG['channel_dump_file']}")
+    return added
+
 async def schedule_push(target_time, message, output_channel):
     """Schedule sending last_summary_message to output_channel at target_time (EST)."""
     est = pytz.timezone("US/Eastern")
@@ -57,6 +81,14 @@ async def schedule_push(target_time, message, output_channel):
 async def on_ready():
     # Print to console
     print(f"✅ Logged in as {client.user}")
+
+    # Catch the ledger up on anything dumped while the bot was offline
+    ingest_channel_dump()
+
+    try:
+        await positions.start()
+    except Exception as e:
+        print(f"⚠️ Position tracker could not start: {e}")
     
     # Also send a “bot is online” message into the trigger channel
     trigger_channel = client.get_channel(CHANNEL_ID_TRIGGER)
@@ -69,6 +101,17 @@ async def on_ready():
 async def on_message(message):
     global last_summary_message
 
+    # Record signal channel traffic in the ledger
+    channel_name = getattr(message.channel, "name", "")
+    if normalize_channel(channel_name) in SIGNAL_CHANNELS and message.author != client.user:
+        local_tz = datetime.now().astimezone().tzinfo
+        timestamp = message.created_at.astimezone(local_tz).strftime("%Y-%m-%d %H:%M")
+        event = ledger.record_message(channel_name, timestamp, message.author.name, message.content)
+        if event:
+            print(f"📒 Ledger: {event['action']} in {normalize_channel(channel_name)} at {timestamp}")
+            if positions.started:
+                positions.sync()
+
     # Only respond in the trigger channel and ignore self-messages
     if message.channel.id != CHANNEL_ID_TRIGGER or message.author == client.user:
         return
@@ -76,14 +119,55 @@ async def on_message(message):
     args = message.content.strip().lower().split()
 
     # === DATA command: store last_summary_message ===
-    if len(args) == 2 and args[0] == "!data":
+    # "!data week" reads the ledger; "!data week llm" re-extracts from the channel dump
+    if len(args) in (2, 3) and args[0] == "!data":
         last_summary_message = await run_trade_summary(
             mode=args[1],
             message=message,
-            openai_client=openai_client
+            openai_key=OPENAI_KEY,
+            source=args[2] if len(args) == 3 else "ledger",
+            marks=positions.marks()
         )
         return
 
+    # === STATS command: all-history aggregates from the ledger ===
+    # "!stats", "!stats ticker", "!stats weekday month"
+    if args[0] == "!stats":
+        by = args[1] if len(args) >= 2 else "tier"
+        period = args[2] if len(args) >= 3 else "all"
+        if by not in GROUP_BY or period not in ("all", "month", "week"):
+            await message.channel.send("❌ Usage: `!stats [tier|ticker|weekday] [all|month|week]`")
+            return
+        try:
+            await message.channel.send(build_stats_message(CONFIG["ledger_file"], by, period))
+        except Exception as e:
+            await message.channel.send(f"❌ Error building stats: {str(e)}")
+        return
+
+    # === POSITIONS command: open positions marked to the latest quote ===
+    if args[0] == "!positions":
+        await message.channel.send(positions.format_positions())
+        return
+
+    # === JOBS command: list queued and running summary jobs ===
+    if args[0] == "!jobs":
+        active = job_pool.active_jobs()
+        if not active:
+            await message.channel.send("💤 No jobs running.")
+        else:
+            await message.channel.send("\n".join(f"#{job.id} `{job.label}` ({job.status})" for job in active))
+        return
+
+    # === CANCEL command: stop a queued or running job ===
+    if args[0] == "!cancel":
+        if len(args) != 2 or not args[1].isdigit():
+            await message.channel.send("❌ Usage: `!cancel <job id>` (see `!jobs`).")
+        elif job_pool.cancel(int(args[1])):
+            await message.channel.send(f"🛑 Cancelling job #{args[1]}...")
+        else:
+            await message.channel.send(f"⚠️ No active job #{args[1]}.")
+        return
+
     # === PUSH command: immediate or scheduled to test/live channels ===
     if args[0] == "!push":
         # Decide which output channel: "live" → tertiary, otherwise → secondary
@@ -143,6 +227,8 @@ async def on_message(message):
     # === KILL command: shut down the bot ===
     if args[0] == "!kill":
         await message.channel.send("🔌 Shutting down...")
+        job_pool.shutdown()
+        await positions.stop()
         await client.close()
         return
 
@@ -151,10 +237,13 @@ async def on_message(message):
         await message.channel.send("🔄 Running parse_signals.py...")
         try:
             await start_parser_bot()
-            await message.channel.send("✅ `parse_signals.py` ran successfully.")
+            added = ingest_channel_dump()
+            await message.channel.send(f"✅ `parse_signals.py` ran successfully. {added} new messages added to the ledger.")
         except Exception as e:
             await message.channel.send(f"❌ Exception occurred while running parser: {str(e)}")
         return
 
 # --- Run the client ---
-asyncio.run(client.start(DISCORD_TOKEN))
+# Guarded so job_pool worker processes can import this module without starting a second bot
+if __name__ == "__main__":
+    asyncio.run(client.start(DISCORD_TOKEN))
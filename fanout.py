@@ -0,0 +1,137 @@
+import asyncio
+import math
+import time
+from alpaca_trade_api.rest import REST
+from resilience import resilient_call, run_blocking, register_provider
+from account_state import SIGNAL_ORDER_PREFIX
+
+# -------- Rate Limit Settings --------
+# Alpaca allows 200 trading API requests per minute per account
+DEFAULT_RATE_PER_MINUTE = 200
+DEFAULT_BURST = 10
+
+
+class TokenBucket:
+    """Per-account request budget; acquire() waits on the event loop instead of failing."""
+
+    def __init__(self, rate_per_minute=DEFAULT_RATE_PER_MINUTE, burst=DEFAULT_BURST):
+        self.rate = rate_per_minute / 60
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Account:
+    """
+    One mirrored brokerage account. `scale` maps a tier ("free", "1", "2", "3")
+    to a quantity multiplier, with "default" for tiers not listed.
+    """
+
+    def __init__(self, name, api_key, secret_key, base_url, scale=None, max_qty=None,
+                 rate_per_minute=DEFAULT_RATE_PER_MINUTE, burst=DEFAULT_BURST):
+        self.name = name
+        self.client = REST(api_key, secret_key, base_url)
+        self.scale = scale or {"default": 1.0}
+        self.max_qty = max_qty
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        # Its own circuit breaker, so one broken account can't stop orders to the rest
+        self.provider = register_provider(f"alpaca:{name}", like="alpaca")
+
+    def quantity(self, base_qty, tier):
+        qty = math.floor(base_qty * self.scale.get(tier, self.scale.get("default", 1.0)))
+        return min(qty, self.max_qty) if self.max_qty else qty
+
+    async def call(self, fn, *args, **kwargs):
+        await self.bucket.acquire()
+        return await run_blocking(resilient_call, self.provider, fn, *args, **kwargs)
+
+
+def load_accounts(configs):
+    return [Account(**config) for config in configs]
+
+
+def is_duplicate_order(exc):
+    """Alpaca answers a reused client_order_id with a 422 naming the field."""
+    status = getattr(exc, "status_code", None)
+    return status == 422 and "client_order_id" in str(exc)
+
+
+async def submit_to_account(account, signal_id, symbol, qty, side, **order):
+    start = time.perf_counter()
+    if qty <= 0:
+        return {"account": account.name, "qty": 0, "status": "skipped", "error": None, "order": None, "ms": 0}
+    order_placed = None
+    # Stable per account and signal, so a retried submit is rejected as a duplicate
+    client_order_id = f"{SIGNAL_ORDER_PREFIX}{signal_id}-{account.name}"[:48]
+    try:
+        try:
+            order_placed = await account.call(
+                account.client.submit_order,
+                symbol=symbol,
+                qty=qty,
+                side=side,
+                client_order_id=client_order_id,
+                **order
+            )
+        except Exception as e:
+            if not is_duplicate_order(e):
+                raise
+            # An earlier attempt outran its deadline but reached Alpaca; that order is ours
+            order_placed = await account.call(account.client.get_order_by_client_order_id, client_order_id)
+        status, error = "submitted", None
+    except Exception as e:
+        status, error = "failed", e
+    return {"account": account.name, "qty": qty, "status": status, "error": error, "order": order_placed,
+            "ms": int((time.perf_counter() - start) * 1000)}
+
+
+async def fan_out_order(accounts, signal_id, symbol, side, quantities, **order):
+    """
+    Submit one signal to every account at once, `quantities` mapping account
+    name to its quantity. Total latency is the slowest account's round trip,
+    not the sum. Returns one result dict per account.
+    """
+    return await asyncio.gather(*(
+        submit_to_account(account, signal_id, symbol, quantities.get(account.name, 0), side, **order)
+        for account in accounts
+    ))
+
+
+def format_fan_out(symbol, side, results, elapsed_ms):
+    """One line summarising a fan-out, e.g. for the console and the owner DM."""
+    placed = [r for r in results if r["status"] == "submitted"]
+    parts = []
+    for r in results:
+        if r["status"] == "submitted":
+            parts.append(f"{r['account']} {r['qty']} ✅ {r['ms']}ms")
+        elif r["status"] == "skipped":
+            parts.append(f"{r['account']} ⏭️ qty 0")
+        else:
+            parts.append(f"{r['account']} ❌ {r['error']}")
+    return (f"🛒 {side.upper()} {symbol} → {len(placed)}/{len(results)} accounts, "
+            f"{sum(r['qty'] for r in placed)} total in {elapsed_ms}ms: " + ", ".join(parts))
+
+
+async def ping_accounts(accounts, method="get_account"):
+    """Warm each account's connection concurrently, returning (name, ms or error) pairs."""
+    async def ping(account):
+        start = time.perf_counter()
+        try:
+            await account.call(getattr(account.client, method))
+            return (f"Alpaca {account.name}", f"{int((time.perf_counter() - start) * 1000)}ms")
+        except Exception as e:
+            return (f"Alpaca {account.name}", f"failed ({e})")
+    return list(await asyncio.gather(*(ping(account) for account in accounts)))
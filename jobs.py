@@ -0,0 +1,142 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# -------- Pool Settings --------
+# Leave one core for the bot's own event loop
+MAX_WORKERS = max(2, (os.cpu_count() or 2) - 1)
+PROGRESS_POLL_SECONDS = 0.25
+STARTED = "__started__"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once its cancel flag is set, and returned to whoever awaited it."""
+
+
+class ProgressReporter:
+    """
+    Passed to job functions as their `progress` callback. Calling it sends a
+    progress line back to the bot and is also where cancellation is noticed.
+    """
+
+    def __init__(self, queue, cancel_event):
+        self.queue = queue
+        self.cancel_event = cancel_event
+
+    def __call__(self, text):
+        self.check_cancelled()
+        self.queue.put(text)
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+
+def _run_job(fn, args, kwargs, reporter):
+    # Runs in the worker process
+    reporter.queue.put(STARTED)
+    return fn(*args, progress=reporter, **kwargs)
+
+
+class Job:
+    def __init__(self, job_id, label, reporter):
+        self.id = job_id
+        self.label = label
+        self.reporter = reporter
+        self.status = "queued"
+        self.future = None
+
+    def cancel(self):
+        if self.future is not None and self.future.cancel():
+            self.status = "cancelled"
+            return
+        self.reporter.cancel_event.set()
+
+
+class JobPool:
+    """A process pool for CPU-bound bot work, with progress callbacks and cancellation."""
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max_workers
+        self.executor = None
+        self.manager = None
+        self.jobs = {}
+        self._ids = itertools.count(1)
+
+    def _start(self):
+        if self.executor is None:
+            self.manager = multiprocessing.Manager()
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def active_jobs(self):
+        return [job for job in self.jobs.values() if job.status in ("queued", "running")]
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if not job or job.status not in ("queued", "running"):
+            return False
+        job.cancel()
+        return True
+
+    async def run(self, label, fn, *args, on_progress=None, on_submit=None, **kwargs):
+        """
+        Run `fn(*args, progress=..., **kwargs)` in a worker process and return its result.
+
+        `on_progress` is awaited with each progress line; `on_submit` is
+        called with the Job as soon as it is queued. Raises JobCancelled if
+        the job is cancelled before or while it runs.
+        """
+        self._start()
+        reporter = ProgressReporter(self.manager.Queue(), self.manager.Event())
+        job = Job(next(self._ids), label, reporter)
+        self.jobs[job.id] = job
+        job.future = self.executor.submit(_run_job, fn, args, kwargs, reporter)
+        if on_submit:
+            on_submit(job)
+
+        wrapped = asyncio.wrap_future(job.future)
+        try:
+            while True:
+                await self._drain(job, on_progress)
+                if wrapped.done():
+                    break
+                await asyncio.wait([wrapped], timeout=PROGRESS_POLL_SECONDS)
+            await self._drain(job, on_progress)
+            # A job that never calls progress() again after !cancel still finishes;
+            # its result must not be delivered as if nobody had cancelled it
+            if wrapped.cancelled() or job.reporter.cancel_event.is_set():
+                if not wrapped.cancelled():
+                    wrapped.exception()  # mark any worker error as retrieved
+                raise JobCancelled()
+            result = wrapped.result()
+            job.status = "done"
+            return result
+        except JobCancelled:
+            job.status = "cancelled"
+            raise
+        except Exception:
+            job.status = "failed"
+            raise
+        finally:
+            self.jobs.pop(job.id, None)
+
+    async def _drain(self, job, on_progress):
+        queue = job.reporter.queue
+        while not queue.empty():
+            text = queue.get_nowait()
+            if text == STARTED:
+                job.status = "running"
+            elif on_progress:
+                await on_progress(text)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.manager.shutdown()
+            self.executor = None
+            self.manager = None
+
+
+job_pool = JobPool()
@@ -0,0 +1,385 @@
+import re
+import sqlite3
+import hashlib
+from datetime import datetime, timedelta
+
+# -------- Configuration --------
+LEDGER_FILE = "trades.db"
+TIME_FMT = "%Y-%m-%d %H:%M"
+
+# Strikes posted without a ticker ("585C EOD @0.68$") are SPY calls in these channels
+DEFAULT_TICKER = "SPY"
+TICKER_ALIASES = {"APPLE": "AAPL"}
+
+# Words that can sit where a ticker would but never are one
+NON_TICKERS = {
+    "A", "ALL", "AND", "AT", "AVG", "BIG", "CALL", "CALLS", "CLOSE", "CLOSED", "CON", "CONS",
+    "CUT", "EOD", "ENTRY", "ENTERED", "EXIT", "EXITED", "EXP", "FEELING", "FOR", "FREE", "FUN",
+    "GUYS", "HIGH", "LOSS", "LOSSES", "LOTTO", "ME", "ONLY", "PLAY", "PLS", "PUT", "PUTS",
+    "RISK", "RISKY", "RUNNER", "SOLD", "SUPER", "THE", "TICKER", "TODAY", "TOOK", "VERY",
+}
+
+# A "leaving a runner" note reopens the last exit in the channel if it came within this window
+RUNNER_WINDOW = timedelta(minutes=30)
+
+LINE_RE = re.compile(r"^(?P<channel>.*?) \[(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2})\] (?P<author>[^:]+): (?P<content>.*)$")
+CHANNEL_RE = re.compile(r"live-signals-[a-z0-9-]+")
+MENTION_RE = re.compile(r"@(everyone|here)\b", re.IGNORECASE)
+# Reminders and apologies that quote an earlier exit price rather than calling a new one
+GUIDANCE_RE = re.compile(r"whoever|just in case|if you (didn|haven)|can exit|sorry", re.IGNORECASE)
+EXIT_RE = re.compile(r"\b(exit|exited|close|closed|sold|cut losses)\b", re.IGNORECASE)
+RUNNER_RE = re.compile(r"\b(left|leaving|leave)\b.*\brunners?\b", re.IGNORECASE)
+AVERAGE_RE = re.compile(r"\bav(g|erag)", re.IGNORECASE)
+# "SPY 599C", "$561 Call", "210$ 5/16 call", "put 551$"; the lookbehind keeps "5/16" from reading as a strike
+CONTRACT_RE = re.compile(
+    r"(?<![/\d.])\$?(?P<strike>\d+(?:\.\d+)?)\s*\$?\s*(?:\d{1,2}/\d{1,2}\s+)?(?P<type>calls?|puts?|c|p)\b"
+    r"|\b(?P<type2>calls?|puts?)\s+(?:EOD\s+)?\$?(?P<strike2>\d+(?:\.\d+)?)\$?",
+    re.IGNORECASE
+)
+# "@1.05", "at $1.34", "@ 2.11"; never a percentage like "@20%"
+AT_PRICE_RE = re.compile(r"(?:@|\bat)\s*\$?(\d+(?:\.\d+)?)(?![\d.]*\s*%)", re.IGNORECASE)
+# Entries occasionally drop the "@": "SPY 600C EOD 1.00$"
+BARE_PRICE_RE = re.compile(r"\b(\d+\.\d+)\s*\$")
+EXPIRY_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})\b")
+WORD_RE = re.compile(r"[A-Za-z]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE NOT NULL,
+    channel TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    author TEXT,
+    content TEXT
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    type TEXT,
+    strike REAL,
+    expiry TEXT,
+    entry REAL,
+    entry_time TEXT NOT NULL,
+    status TEXT NOT NULL,
+    closed_time TEXT
+);
+CREATE TABLE IF NOT EXISTS exits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    trade_id INTEGER REFERENCES trades(id),
+    channel TEXT NOT NULL,
+    ticker TEXT,
+    price REAL NOT NULL,
+    exit_time TEXT NOT NULL,
+    partial INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp);
+CREATE INDEX IF NOT EXISTS idx_trades_open ON trades(channel, status, entry_time);
+CREATE INDEX IF NOT EXISTS idx_trades_entry_time ON trades(entry_time);
+CREATE INDEX IF NOT EXISTS idx_exits_time ON exits(exit_time);
+CREATE INDEX IF NOT EXISTS idx_exits_trade ON exits(trade_id);
+"""
+
+
+# -------- Signal Parsing --------
+def normalize_channel(name):
+    """Strip decorations like the 📡︱ prefix so live and dumped channel names agree."""
+    match = CHANNEL_RE.search(name)
+    return match.group(0) if match else name
+
+
+def find_ticker(text):
+    for word in WORD_RE.findall(text):
+        upper = word.upper()
+        if upper in TICKER_ALIASES:
+            return TICKER_ALIASES[upper]
+        if len(word) <= 5 and upper not in NON_TICKERS:
+            return upper
+    return None
+
+
+def find_price(text, allow_bare=False):
+    match = AT_PRICE_RE.search(text)
+    if match:
+        return float(match.group(1))
+    if allow_bare:
+        match = BARE_PRICE_RE.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def parse_expiry(text, timestamp):
+    if "EOD" in text.upper() or "TODAY" in text.upper():
+        return timestamp.split()[0]
+    match = EXPIRY_RE.search(text)
+    if not match:
+        return None
+    year = int(timestamp[:4])
+    try:
+        return datetime(year, int(match.group(1)), int(match.group(2))).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def parse_signal(content, timestamp):
+    """
+    Turn one chat message into a ledger event, or None if it is commentary.
+
+    Events are {"action": "entry", ticker, type, strike, expiry, price},
+    {"action": "exit", ticker (or None), price, partial} or {"action": "runner"}.
+    """
+    text = MENTION_RE.sub(" ", content).strip()
+    if not text or GUIDANCE_RE.search(text):
+        return None
+
+    if EXIT_RE.search(text):
+        price = find_price(text)
+        if price is None:
+            return None
+        # Only words ahead of the price can name the ticker ("RKLB exit @0.67", "Exit XYZ @1.25")
+        ticker = find_ticker(text[:AT_PRICE_RE.search(text).start()])
+        return {
+            "action": "exit",
+            "ticker": ticker,
+            "price": price,
+            "partial": bool(RUNNER_RE.search(text)),
+        }
+
+    if RUNNER_RE.search(text):
+        return {"action": "runner"}
+
+    # Averaging down changes size, not the trade, so it is not a new entry
+    if AVERAGE_RE.search(text):
+        return None
+
+    contract = CONTRACT_RE.search(text)
+    if not contract:
+        return None
+    price = find_price(text, allow_bare=True)
+    if price is None:
+        return None
+    strike = contract.group("strike") or contract.group("strike2")
+    kind = (contract.group("type") or contract.group("type2")).lower()
+    before_price = AT_PRICE_RE.search(text)
+    head = text[:before_price.start()] if before_price else text
+    return {
+        "action": "entry",
+        "ticker": find_ticker(head.replace(contract.group(0), " ")) or DEFAULT_TICKER,
+        "type": "call" if kind.startswith("c") else "put",
+        "strike": float(strike),
+        "expiry": parse_expiry(text, timestamp),
+        "price": price,
+    }
+
+
+def parse_dump_lines(lines):
+    """Yield (channel, timestamp, author, content) from a parse_signals.py dump, joining wrapped lines."""
+    current = None
+    for raw in lines:
+        line = raw.rstrip("\n")
+        match = LINE_RE.match(line)
+        if match:
+            if current:
+                yield current
+            current = (match["channel"], match["timestamp"], match["author"], match["content"])
+        elif current:
+            channel, timestamp, author, content = current
+            current = (channel, timestamp, author, content + "\n" + line)
+    if current:
+        yield current
+
+
+# -------- Ledger --------
+class TradeLedger:
+    """
+    SQLite ledger of entries, exits and the trades they form.
+
+    Messages are stored verbatim and applied to the trade tables as they
+    arrive. If a message lands out of order (e.g. a backfill of older
+    history), the trade tables are replayed from the stored messages.
+    """
+
+    def __init__(self, path=LEDGER_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        # Ticker most recently talked about per channel, used to place "Exit @1.10" messages
+        self.focus = {}
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def message_key(channel, timestamp, author, content):
+        return hashlib.sha1(f"{channel}|{timestamp}|{author}|{content}".encode("utf-8")).hexdigest()
+
+    def latest_timestamp(self):
+        row = self.conn.execute("SELECT MAX(timestamp) FROM messages").fetchone()
+        return row[0]
+
+    def record_message(self, channel, timestamp, author, content):
+        """Store one message and apply it to the trade tables. Returns the parsed event, if any."""
+        event, out_of_order = self._store(normalize_channel(channel), timestamp, author, content)
+        if out_of_order:
+            # Older than something already applied, so replay everything in time order
+            self.rebuild()
+            event = parse_signal(content, timestamp)
+        self.conn.commit()
+        return event
+
+    def _store(self, channel, timestamp, author, content):
+        latest = self.latest_timestamp()
+        key = self.message_key(channel, timestamp, author, content)
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO messages (key, channel, timestamp, author, content) VALUES (?, ?, ?, ?, ?)",
+            (key, channel, timestamp, author, content)
+        )
+        if cursor.rowcount == 0:
+            return None, False
+        if latest and timestamp < latest:
+            return None, True
+        return self._apply(channel, timestamp, content), False
+
+    def ingest_dump(self, path):
+        """Load a channel dump, skipping messages already in the ledger. Returns the number of new messages."""
+        added = 0
+        needs_replay = False
+        with open(path, "r", encoding="utf-8") as f:
+            for channel, timestamp, author, content in parse_dump_lines(f):
+                before = self.conn.total_changes
+                _, out_of_order = self._store(normalize_channel(channel), timestamp, author, content)
+                needs_replay = needs_replay or out_of_order
+                if self.conn.total_changes != before:
+                    added += 1
+        if needs_replay:
+            self.rebuild()
+        self.conn.commit()
+        return added
+
+    def rebuild(self):
+        """Replay every stored message in time order to regenerate trades and exits."""
+        self.conn.execute("DELETE FROM exits")
+        self.conn.execute("DELETE FROM trades")
+        self.focus = {}
+        rows = self.conn.execute("SELECT channel, timestamp, content FROM messages ORDER BY timestamp, seq").fetchall()
+        for row in rows:
+            self._apply(row["channel"], row["timestamp"], row["content"])
+        self.conn.commit()
+
+    def _apply(self, channel, timestamp, content):
+        self._update_focus(channel, content)
+        event = parse_signal(content, timestamp)
+        if event is None:
+            return None
+
+        if event["action"] == "entry":
+            self.focus[channel] = event["ticker"]
+            self.conn.execute(
+                "INSERT INTO trades (channel, ticker, type, strike, expiry, entry, entry_time, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 'open')",
+                (channel, event["ticker"], event["type"], event["strike"], event["expiry"], event["price"], timestamp)
+            )
+        elif event["action"] == "exit":
+            trade = self._match_open_trade(channel, event["ticker"] or self.focus.get(channel), timestamp)
+            if trade is None and not event["ticker"]:
+                trade = self._match_open_trade(channel, None, timestamp)
+            trade_id = trade["id"] if trade else None
+            self.conn.execute(
+                "INSERT INTO exits (trade_id, channel, ticker, price, exit_time, partial) VALUES (?, ?, ?, ?, ?, ?)",
+                (trade_id, channel, event["ticker"] or (trade["ticker"] if trade else None),
+                 event["price"], timestamp, int(event["partial"]))
+            )
+            if trade and not event["partial"]:
+                self.conn.execute(
+                    "UPDATE trades SET status = 'closed', closed_time = ? WHERE id = ?",
+                    (timestamp, trade_id)
+                )
+            if trade is None:
+                print(f"⚠️ Ledger: exit in {channel} at {timestamp} has no open entry")
+        elif event["action"] == "runner":
+            self._reopen_for_runner(channel, timestamp)
+        return event
+
+    def _update_focus(self, channel, content):
+        words = {word.upper() for word in WORD_RE.findall(content)}
+        if not words:
+            return
+        rows = self.conn.execute(
+            "SELECT DISTINCT ticker FROM trades WHERE channel = ? AND status = 'open'", (channel,)
+        ).fetchall()
+        mentioned = [row["ticker"] for row in rows if row["ticker"] in words]
+        if len(mentioned) == 1:
+            self.focus[channel] = mentioned[0]
+
+    def _match_open_trade(self, channel, ticker, timestamp):
+        """Most recent open entry in the channel, optionally restricted to a ticker."""
+        query = "SELECT * FROM trades WHERE channel = ? AND status = 'open' AND entry_time <= ?"
+        params = [channel, timestamp]
+        if ticker:
+            query += " AND ticker = ?"
+            params.append(ticker)
+        query += " ORDER BY entry_time DESC, id DESC LIMIT 1"
+        return self.conn.execute(query, params).fetchone()
+
+    def _reopen_for_runner(self, channel, timestamp):
+        trade = self.conn.execute(
+            "SELECT * FROM trades WHERE channel = ? AND status = 'closed' ORDER BY closed_time DESC, id DESC LIMIT 1",
+            (channel,)
+        ).fetchone()
+        if not trade:
+            return
+        closed = datetime.strptime(trade["closed_time"], TIME_FMT)
+        if datetime.strptime(timestamp, TIME_FMT) - closed > RUNNER_WINDOW:
+            return
+        self.conn.execute("UPDATE trades SET status = 'open', closed_time = NULL WHERE id = ?", (trade["id"],))
+        self.conn.execute(
+            "UPDATE exits SET partial = 1 WHERE trade_id = ? AND exit_time = ?",
+            (trade["id"], trade["closed_time"])
+        )
+
+    # -------- Queries --------
+    def _with_exits(self, rows):
+        trades = [dict(row) for row in rows]
+        if not trades:
+            return trades
+        ids = [trade["id"] for trade in trades]
+        placeholders = ",".join("?" * len(ids))
+        exits = self.conn.execute(
+            f"SELECT trade_id, price, exit_time, partial FROM exits WHERE trade_id IN ({placeholders}) ORDER BY exit_time, id",
+            ids
+        ).fetchall()
+        by_trade = {trade["id"]: trade for trade in trades}
+        for trade in trades:
+            trade["exits"] = []
+        for row in exits:
+            by_trade[row["trade_id"]]["exits"].append(dict(row))
+        return trades
+
+    def trades_for_dates(self, start_date, end_date):
+        """
+        Trades whose relevant date falls in [start_date, end_date] (YYYY-MM-DD):
+        the last exit for trades with exits, the entry for trades without.
+        """
+        lo, hi = f"{start_date} 00:00", f"{end_date} 23:59"
+        exited = self.conn.execute(
+            "SELECT t.* FROM trades t WHERE t.id IN "
+            "(SELECT trade_id FROM exits WHERE exit_time BETWEEN ? AND ? AND trade_id IS NOT NULL)",
+            (lo, hi)
+        ).fetchall()
+        unexited = self.conn.execute(
+            "SELECT * FROM trades WHERE entry_time BETWEEN ? AND ? "
+            "AND NOT EXISTS (SELECT 1 FROM exits WHERE exits.trade_id = trades.id)",
+            (lo, hi)
+        ).fetchall()
+        trades = [t for t in self._with_exits(exited) if lo <= t["exits"][-1]["exit_time"] <= hi]
+        trades += self._with_exits(unexited)
+        return sorted(trades, key=lambda t: (t["entry_time"], t["id"]))
+
+    def all_trades(self):
+        return self._with_exits(self.conn.execute("SELECT * FROM trades ORDER BY entry_time, id").fetchall())
+
+    def open_trades(self):
+        return self._with_exits(
+            self.conn.execute("SELECT * FROM trades WHERE status = 'open' ORDER BY entry_time, id").fetchall()
+        )
@@ -0,0 +1,300 @@
+import json
+import re
+import time
+from datetime import datetime
+from resilience import resilient_call
+
+# -------- Models --------
+# Prices are USD per 1M tokens (input, output).
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# -------- Routes --------
+# Each call site starts on its small model when the input is short enough,
+# and escalates to its large model when the reply fails validation.
+# deadline is the per-attempt budget in seconds handed to the resilience layer.
+# budget, where set, caps the whole call (retries and escalation included) in seconds.
+ROUTES = {
+    "live_parse": {
+        "small": "gpt-4o-mini",
+        "large": "gpt-4o",
+        "deadline": 8.0,
+        "budget": 15.0,
+        "max_small_chars": 280,
+        "max_small_lines": 3,
+    },
+    "tier_extract": {
+        "small": "gpt-4o-mini",
+        "large": "gpt-4o",
+        "deadline": 60.0,
+        "max_small_chars": 1500,
+        "max_small_lines": 15,
+    },
+    "orphan_search": {
+        "small": "gpt-4o-mini",
+        "large": "gpt-4o",
+        "deadline": 60.0,
+        "max_small_chars": 1500,
+        "max_small_lines": 15,
+    },
+    "validate_summary": {
+        "small": "gpt-4o-mini",
+        "large": "gpt-4o",
+        "deadline": 30.0,
+        "max_small_chars": 1200,
+        "max_small_lines": 25,
+    },
+}
+
+ROUTING_LOG_FILE = "model_routing.jsonl"
+
+
+class RoutingError(Exception):
+    """Raised when every model on a route failed to produce a valid reply."""
+
+
+class JsonArrayParser:
+    """
+    Incremental parser for a streamed JSON array of objects. feed() takes each
+    text delta and returns the objects it completed. A code fence or other text
+    before the opening bracket is skipped.
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text):
+        self.buf += text
+        items = []
+        while self.pos < len(self.buf) and not self.done:
+            ch = self.buf[self.pos]
+            if not self.started:
+                if ch == "[":
+                    self.started = True
+                elif not (ch.isspace() or ch.isalpha() or ch == "`"):
+                    raise ValueError("reply is not a JSON array")
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif self.depth == 0:
+                if ch == "]":
+                    self.done = True
+                elif ch == "{":
+                    # Drop everything already consumed so the buffer only ever holds one item
+                    self.buf = self.buf[self.pos:]
+                    self.pos = 0
+                    self.depth = 1
+                elif not (ch.isspace() or ch == ","):
+                    raise ValueError("array item is not an object")
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    items.append(json.loads(self.buf[:self.pos + 1]))
+            self.pos += 1
+        return items
+
+
+def strip_code_fences(content):
+    """Models often wrap JSON replies in a ```json fence; strip it before parsing."""
+    return re.sub(r"^```(?:json)?|```$", "", content.strip(), flags=re.MULTILINE).strip()
+
+
+def pick_model(call_site, input_text):
+    """Return (model, reason) for the given call site and input."""
+    route = ROUTES[call_site]
+    chars = len(input_text)
+    lines = input_text.count("\n") + 1
+    if chars <= route["max_small_chars"] and lines <= route["max_small_lines"]:
+        return route["small"], f"short input ({chars} chars, {lines} lines)"
+    return route["large"], f"long input ({chars} chars, {lines} lines)"
+
+
+def estimate_cost(model, usage):
+    if usage is None or model not in MODEL_PRICING:
+        return 0.0
+    price_in, price_out = MODEL_PRICING[model]
+    return (usage.prompt_tokens * price_in + usage.completion_tokens * price_out) / 1_000_000
+
+
+def log_routing(record):
+    print(
+        f"[Router] {record['call_site']} → {record['model']} ({record['reason']}) "
+        f"{record['outcome']} in {record['latency_ms']}ms, ${record['cost_usd']:.5f}"
+    )
+    try:
+        with open(ROUTING_LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except Exception as e:
+        print(f"⚠️ Could not write routing log: {e}")
+
+
+def routed_completion(openai_client, call_site, messages, input_text, validate, temperature=0):
+    """
+    Run a chat completion for `call_site`, picking the model from `input_text`.
+
+    `validate` receives the raw reply text and returns the parsed result, or
+    raises ValueError when the reply fails schema or confidence checks. A
+    small-model reply that fails validation is retried once on the route's
+    large model; timeouts and API errors are not, since the resilience layer
+    has already retried them.
+    """
+    route = ROUTES[call_site]
+    model, reason = pick_model(call_site, input_text)
+    attempts = [(model, reason)]
+    if model != route["large"]:
+        attempts.append((route["large"], "escalated"))
+    expires = time.monotonic() + route["budget"] if "budget" in route else None
+
+    last_error = None
+    for model, reason in attempts:
+        start = time.perf_counter()
+        budget = None
+        if expires is not None:
+            budget = expires - time.monotonic()
+            if budget <= 0:
+                last_error = f"{route['budget']:.0f}s budget spent"
+                break
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "call_site": call_site,
+            "model": model,
+            "reason": reason,
+            "input_chars": len(input_text),
+        }
+        try:
+            response = resilient_call(
+                "openai",
+                openai_client.chat.completions.create,
+                deadline=route["deadline"],
+                budget=budget,
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                timeout=route["deadline"]
+            )
+            usage = getattr(response, "usage", None)
+            record["cost_usd"] = round(estimate_cost(model, usage), 6)
+            result = validate(response.choices[0].message.content)
+            record["outcome"] = "ok"
+            return result
+        except ValueError as e:
+            record.setdefault("cost_usd", 0.0)
+            record["outcome"] = f"invalid: {e}"
+            last_error = e
+        except Exception as e:
+            record.setdefault("cost_usd", 0.0)
+            record["outcome"] = f"error: {e}"
+            raise RoutingError(f"{call_site}: {model} failed ({e})") from e
+        finally:
+            record["latency_ms"] = int((time.perf_counter() - start) * 1000)
+            log_routing(record)
+
+    raise RoutingError(f"{call_site}: no valid reply ({last_error})")
+
+
+def routed_stream(openai_client, call_site, messages, input_text, validate_item, require_items=False, temperature=0):
+    """
+    Streamed counterpart of routed_completion for replies that are a JSON array.
+
+    Yields each array item once its closing brace arrives and `validate_item`
+    accepts it (it raises ValueError to drop an item). A reply that is not an
+    array, or is empty when `require_items` is set, escalates to the large
+    model, but only while nothing has been yielded; API errors do not escalate. Once items are out, a
+    stream that is cut off ends the generator and keeps what was already yielded.
+    """
+    route = ROUTES[call_site]
+    model, reason = pick_model(call_site, input_text)
+    attempts = [(model, reason)]
+    if model != route["large"]:
+        attempts.append((route["large"], "escalated"))
+
+    last_error = None
+    for model, reason in attempts:
+        start = time.perf_counter()
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "call_site": call_site,
+            "model": model,
+            "reason": reason,
+            "input_chars": len(input_text),
+            "cost_usd": 0.0,
+            # Kept if the consumer stops iterating (e.g. a cancelled job), so the attempt is still logged
+            "outcome": "abandoned",
+        }
+        stream = None
+        yielded = dropped = 0
+        try:
+            # Retries and the deadline cover opening the stream; `timeout` then bounds each read
+            stream = resilient_call(
+                "openai",
+                openai_client.chat.completions.create,
+                deadline=route["deadline"],
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=route["deadline"]
+            )
+            parser = JsonArrayParser()
+            try:
+                for chunk in stream:
+                    if getattr(chunk, "usage", None):
+                        record["cost_usd"] = round(estimate_cost(model, chunk.usage), 6)
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    for item in parser.feed(chunk.choices[0].delta.content):
+                        try:
+                            item = validate_item(item)
+                        except ValueError as e:
+                            dropped += 1
+                            print(f"⚠️ {call_site}: dropped invalid item ({e})")
+                            continue
+                        yielded += 1
+                        yield item
+            except Exception as e:
+                if not yielded:
+                    raise
+                record["outcome"] = f"truncated after {yielded} items: {e}"
+                return
+
+            if not parser.started:
+                raise ValueError("reply is not a JSON array")
+            if not parser.done and not yielded:
+                raise ValueError("reply ended before the array closed")
+            if require_items and not yielded:
+                raise ValueError("no valid items in reply")
+            record["outcome"] = "ok" if parser.done else f"truncated after {yielded} items"
+            if dropped:
+                record["outcome"] += f" ({dropped} dropped)"
+            return
+        except ValueError as e:
+            record["outcome"] = f"invalid: {e}"
+            last_error = e
+        except Exception as e:
+            record["outcome"] = f"error: {e}"
+            raise RoutingError(f"{call_site}: {model} failed ({e})") from e
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            record["latency_ms"] = int((time.perf_counter() - start) * 1000)
+            log_routing(record)
+
+    raise RoutingError(f"{call_site}: no valid reply ({last_error})")
@@ -0,0 +1,357 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from ledger import TradeLedger, normalize_channel, LEDGER_FILE
+
+# -------- Configuration --------
+OPEN_POSITIONS_FILE = "open_positions.jsonl"
+CONTRACT_MULTIPLIER = 100
+STALE_QUOTE_SECONDS = 120
+FAKE_TICK_SECONDS = 1.0
+FAKE_VOLATILITY = 0.03
+
+
+def position_key(channel, ticker, kind, entry):
+    """
+    Matches a summary trade dict to a tracked position without a ledger id (LLM trades have none).
+    Coarse on purpose: trades that collide here all get the mark, so it is only used for lookups.
+    """
+    return (normalize_channel(channel), ticker.upper(), kind, round(float(entry), 2))
+
+
+def occ_symbol(ticker, expiry, strike, kind):
+    """OCC option symbol, e.g. SPY250606P00599000, or None when the contract is not fully specified."""
+    if not (ticker and expiry and strike and kind in ("call", "put")):
+        return None
+    yymmdd = datetime.strptime(expiry, "%Y-%m-%d").strftime("%y%m%d")
+    return f"{ticker.upper()}{yymmdd}{'C' if kind == 'call' else 'P'}{int(round(strike * 1000)):08d}"
+
+
+# -------- Quote Streams --------
+class QuoteStream:
+    """
+    Pushes quotes for subscribed option symbols to `on_quote(symbol, bid, ask, timestamp)`,
+    always on the event loop that called start(). `symbols` map each symbol to a
+    reference price (the entry) that feeds without market data can start from.
+    """
+
+    async def start(self, on_quote):
+        raise NotImplementedError
+
+    def subscribe(self, symbols):
+        raise NotImplementedError
+
+    def unsubscribe(self, symbols):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+class AlpacaQuoteStream(QuoteStream):
+    """Option quotes from Alpaca's market data websocket, read on its own thread."""
+
+    def __init__(self, api_key, secret_key, feed="indicative"):
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.feed = feed
+        self.stream = None
+        self.thread = None
+        self.symbols = set()
+        self._handler = None
+
+    async def start(self, on_quote):
+        # alpaca-py ships the options stream; alpaca_trade_api only streams stocks and crypto
+        from alpaca.data.enums import OptionsFeed
+        from alpaca.data.live.option import OptionDataStream
+
+        loop = asyncio.get_running_loop()
+
+        async def handle(quote):
+            loop.call_soon_threadsafe(on_quote, quote.symbol, quote.bid_price, quote.ask_price, quote.timestamp)
+
+        self._handler = handle
+        self.stream = OptionDataStream(self.api_key, self.secret_key, feed=OptionsFeed(self.feed))
+        if self.symbols:
+            self._run()
+
+    def _run(self):
+        self.stream.subscribe_quotes(self._handler, *self.symbols)
+        # The SDK runs its own event loop, so it gets a thread rather than a task on ours
+        self.thread = threading.Thread(target=self.stream.run, name="alpaca-quotes", daemon=True)
+        self.thread.start()
+
+    def subscribe(self, symbols):
+        new = set(symbols) - self.symbols
+        self.symbols |= new
+        if not new or self.stream is None:
+            return
+        if self.thread is None:
+            self._run()
+        else:
+            self.stream.subscribe_quotes(self._handler, *new)
+
+    def unsubscribe(self, symbols):
+        gone = set(symbols) & self.symbols
+        self.symbols -= gone
+        if gone and self.thread is not None:
+            self.stream.unsubscribe_quotes(*gone)
+
+    async def stop(self):
+        if self.thread is not None:
+            self.stream.stop()
+            self.thread = None
+
+
+class FakeQuoteFeed(QuoteStream):
+    """Local random-walk quotes around each position's entry, for running the tracker without market data."""
+
+    def __init__(self, interval=FAKE_TICK_SECONDS, volatility=FAKE_VOLATILITY, seed=None):
+        self.interval = interval
+        self.volatility = volatility
+        self.rng = random.Random(seed)
+        self.prices = {}
+        self.on_quote = None
+        self.task = None
+
+    async def start(self, on_quote):
+        self.on_quote = on_quote
+        if self.interval:
+            self.task = asyncio.create_task(self._walk())
+
+    def subscribe(self, symbols):
+        for symbol, reference in symbols.items():
+            self.prices.setdefault(symbol, reference or 1.0)
+
+    def unsubscribe(self, symbols):
+        for symbol in symbols:
+            self.prices.pop(symbol, None)
+
+    def push(self, symbol, bid, ask=None):
+        """Deliver one exact quote, e.g. from a test."""
+        self.prices[symbol] = bid if ask is None else (bid + ask) / 2
+        self.on_quote(symbol, bid, bid if ask is None else ask, datetime.now())
+
+    async def _walk(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            for symbol, price in list(self.prices.items()):
+                price = max(0.01, round(price * (1 + self.rng.gauss(0, self.volatility)), 2))
+                self.prices[symbol] = price
+                self.on_quote(symbol, round(price - 0.01, 2), round(price + 0.01, 2), datetime.now())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
+# -------- Positions --------
+class Position:
+    def __init__(self, channel, ticker, kind, strike, expiry, entry, entry_time, source, qty=1, ledger_id=None):
+        self.channel = normalize_channel(channel)
+        self.ticker = ticker.upper()
+        self.type = kind
+        self.strike = strike
+        self.expiry = expiry
+        self.entry = entry
+        self.entry_time = entry_time
+        self.source = source
+        self.qty = qty
+        self.symbol = occ_symbol(self.ticker, expiry, strike, kind)
+        self.lookup_key = position_key(self.channel, self.ticker, kind, entry)
+        # Ledger rows are distinct trades even on the same contract; file rows have only what they describe
+        self.key = ("ledger", ledger_id) if ledger_id is not None else ("file", self.lookup_key, strike, expiry)
+        self.mark = None
+        self.marked_at = None
+        self.unrealized = 0.0
+
+    @property
+    def pct(self):
+        return (self.mark - self.entry) / self.entry * 100 if self.mark is not None and self.entry else 0.0
+
+    def update(self, mark):
+        """Re-mark and return the change in unrealized P&L."""
+        before = self.unrealized
+        self.mark = mark
+        self.marked_at = time.monotonic()
+        self.unrealized = (mark - self.entry) * CONTRACT_MULTIPLIER * self.qty
+        return self.unrealized - before
+
+    def describe(self):
+        strike = f" {self.strike:g}" if self.strike else ""
+        expiry = f" {self.expiry[5:].replace('-', '/')}" if self.expiry else ""
+        return f"{self.ticker}{strike} {self.type}{expiry}"
+
+
+def same_contract(strike, expiry, other_strike, other_expiry):
+    """Strike and expiry agree wherever both sides know them; open_positions.jsonl rows usually lack a strike."""
+    return ((strike is None or other_strike is None or float(strike) == float(other_strike))
+            and (expiry is None or other_expiry is None or expiry == other_expiry))
+
+
+def mark_price(bid, ask):
+    if bid and ask:
+        return round((bid + ask) / 2, 4)
+    return ask or bid or None
+
+
+def load_open_positions_file(path=OPEN_POSITIONS_FILE):
+    """Rows from open_positions.jsonl whose status is still open; entries there are strings like "$1.88"."""
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if row.get("status") != "open" or not row.get("entry"):
+                continue
+            try:
+                row["entry"] = float(str(row["entry"]).replace("$", ""))
+            except ValueError:
+                continue
+            rows.append(row)
+    return rows
+
+
+class PositionTracker:
+    """
+    In-memory marks for every open position. Quotes arrive over a QuoteStream,
+    so each tick is a dict lookup and an incremental P&L update, not a REST call.
+    """
+
+    def __init__(self, stream, ledger_file=LEDGER_FILE, positions_file=OPEN_POSITIONS_FILE):
+        self.stream = stream
+        self.ledger_file = ledger_file
+        self.positions_file = positions_file
+        self.positions = {}
+        self.by_symbol = defaultdict(list)
+        self.total_unrealized = 0.0
+        self.ticks = 0
+        self.started = False
+        self.starting = False
+
+    def _collect(self, today):
+        found = {}
+        # lookup_key → [(strike, expiry)] of every ledger trade, open or closed
+        in_ledger = defaultdict(list)
+        ledger = TradeLedger(self.ledger_file)
+        try:
+            for t in ledger.all_trades():
+                if not t["entry"]:
+                    continue
+                # Signals without a date are same-day contracts, as with "EOD" in parse_expiry
+                expiry = t["expiry"] or t["entry_time"].split()[0]
+                in_ledger[position_key(t["channel"], t["ticker"], t["type"], t["entry"])].append((t["strike"], expiry))
+                if t["status"] != "open":
+                    continue
+                p = Position(t["channel"], t["ticker"], t["type"], t["strike"], expiry,
+                             t["entry"], t["entry_time"], "ledger", ledger_id=t["id"])
+                found[p.key] = p
+        finally:
+            ledger.close()
+        for row in load_open_positions_file(self.positions_file):
+            p = Position(row["channel"], row["ticker"], row["type"], row.get("strike"), row.get("expiry"),
+                         row["entry"], row.get("entry_time"), "file")
+            # The ledger wins: it either tracks this trade already or has seen the exit
+            if not any(same_contract(p.strike, p.expiry, strike, expiry) for strike, expiry in in_ledger[p.lookup_key]):
+                found.setdefault(p.key, p)
+        # Expired contracts can't be quoted, and are almost always exits nobody posted
+        return {key: p for key, p in found.items() if not p.expiry or p.expiry >= today}
+
+    def sync(self, today=None):
+        """Reconcile with the ledger and open_positions.jsonl, (un)subscribing only what changed."""
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        current = self._collect(today)
+        added = [p for key, p in current.items() if key not in self.positions]
+        removed = [p for key, p in self.positions.items() if key not in current]
+
+        for p in removed:
+            del self.positions[p.key]
+            self.total_unrealized -= p.unrealized
+            if p.symbol:
+                self.by_symbol[p.symbol].remove(p)
+                if not self.by_symbol[p.symbol]:
+                    del self.by_symbol[p.symbol]
+        for p in added:
+            self.positions[p.key] = p
+            if p.symbol:
+                self.by_symbol[p.symbol].append(p)
+
+        gone = {p.symbol for p in removed if p.symbol and p.symbol not in self.by_symbol}
+        new = {p.symbol: p.entry for p in added if p.symbol and len(self.by_symbol[p.symbol]) == 1}
+        if gone:
+            self.stream.unsubscribe(gone)
+        if new:
+            self.stream.subscribe(new)
+        if added or removed:
+            print(f"📍 Positions: {len(self.positions)} open (+{len(added)}/-{len(removed)}), {len(self.by_symbol)} quoted")
+        return len(added), len(removed)
+
+    async def start(self):
+        if self.started or self.starting:
+            return
+        self.starting = True
+        try:
+            await self.stream.start(self.on_quote)
+            # Only once the feed is up, so a failed start can be retried
+            self.started = True
+        finally:
+            self.starting = False
+        self.sync()
+
+    async def stop(self):
+        await self.stream.stop()
+        self.started = False
+
+    def on_quote(self, symbol, bid, ask, timestamp=None):
+        mark = mark_price(bid, ask)
+        if mark is None:
+            return
+        self.ticks += 1
+        for p in self.by_symbol.get(symbol, ()):
+            self.total_unrealized += p.update(mark)
+
+    def marks(self):
+        """{position_key: {"mark", "pct", "unrealized"}} for positions with a quote, for the summary workers."""
+        marks = {}
+        for p in self.positions.values():
+            if p.mark is not None:
+                marks.setdefault(p.lookup_key, {"mark": p.mark, "pct": round(p.pct, 2),
+                                                "unrealized": round(p.unrealized, 2)})
+        return marks
+
+    def format_positions(self):
+        """Text for `!positions`."""
+        if not self.positions:
+            return "📭 No open positions."
+        now = time.monotonic()
+        lines = ["**Open Positions**"]
+        by_channel = defaultdict(list)
+        for p in self.positions.values():
+            by_channel[p.channel].append(p)
+        for channel in sorted(by_channel):
+            lines.append(f"{channel}:")
+            for p in sorted(by_channel[channel], key=lambda p: p.entry_time or ""):
+                line = f"- {p.describe()} @ ${p.entry:.2f}"
+                if p.symbol is None:
+                    line += " (no quote: contract missing strike or expiry)"
+                elif p.mark is None:
+                    line += " (waiting for a quote)"
+                else:
+                    line += f" → ${p.mark:.2f} ({p.pct:+.2f}%, ${p.unrealized:+,.2f})"
+                    if now - p.marked_at > STALE_QUOTE_SECONDS:
+                        line += " ⏳ stale"
+                lines.append(line)
+        marked = sum(1 for p in self.positions.values() if p.mark is not None)
+        lines.append(f"Unrealized P&L (1 contract each): ${self.total_unrealized:+,.2f} "
+                     f"across {marked}/{len(self.positions)} marked positions")
+        return "\n".join(lines)
@@ -0,0 +1,208 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, FIRST_COMPLETED, wait
+
+# -------- Policies --------
+# deadline: seconds allowed per attempt
+# retries: extra attempts after the first (only for idempotent calls)
+# base_delay / max_delay: bounds for the jittered exponential backoff
+# workers: threads in the provider's own deadline pool
+POLICIES = {
+    "openai": {"deadline": 30.0, "retries": 2, "base_delay": 0.5, "max_delay": 4.0, "workers": 16},
+    "alpaca": {"deadline": 5.0, "retries": 2, "base_delay": 0.25, "max_delay": 2.0, "workers": 8},
+}
+
+# -------- Circuit Breaker Settings --------
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+
+# -------- Hedging Settings --------
+HEDGE_MIN_SAMPLES = 20
+
+# A timed-out call keeps its thread until it returns (alpaca_trade_api sets no socket
+# timeout), so each provider gets its own pool: a hung Alpaca can't starve OpenAI calls.
+# Hedging has its own pool too, so a hedged call waiting on deadline-bound calls can never starve them.
+_call_executors = {}
+_call_executors_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call does not finish within its deadline."""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            # Half-open: let one probe through once the reset window has passed
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"🔌 Circuit open for {self.name} after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def p95(self):
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+BREAKERS = {name: CircuitBreaker(name) for name in POLICIES}
+LATENCIES = {}
+
+
+def register_provider(name, like):
+    """Add a provider that shares `like`'s policy but has its own circuit breaker."""
+    POLICIES.setdefault(name, POLICIES[like])
+    BREAKERS.setdefault(name, CircuitBreaker(name))
+    return name
+
+
+def is_retryable(exc):
+    """Timeouts, connection failures, 429s and 5xx are worth retrying; everything else is not."""
+    if isinstance(exc, (TimeoutError, ConnectionError, OSError)):
+        return True
+    if type(exc).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429 or (isinstance(status, int) and status >= 500)
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    # Full jitter: uniform between 0 and the capped exponential step
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_executor(provider):
+    with _call_executors_lock:
+        if provider not in _call_executors:
+            _call_executors[provider] = ThreadPoolExecutor(
+                max_workers=POLICIES[provider]["workers"], thread_name_prefix=f"deadline-{provider}"
+            )
+        return _call_executors[provider]
+
+
+def call_with_deadline(provider, fn, deadline, *args, **kwargs):
+    future = call_executor(provider).submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=deadline)
+    except FutureTimeout:
+        future.cancel()
+        raise DeadlineExceeded(f"{getattr(fn, '__name__', 'call')} exceeded {deadline:.1f}s")
+
+
+def resilient_call(provider, fn, *args, idempotent=True, deadline=None, budget=None, **kwargs):
+    """
+    Call `fn` against `provider` with a per-attempt deadline, jittered retry
+    for idempotent calls, and the provider's circuit breaker. `budget` caps
+    the seconds spent on all attempts and backoff together.
+    """
+    policy = POLICIES[provider]
+    breaker = BREAKERS[provider]
+    deadline = deadline or policy["deadline"]
+    retries = policy["retries"] if idempotent else 0
+    expires = time.monotonic() + budget if budget is not None else None
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{provider} circuit is open")
+        attempt_deadline = deadline
+        if expires is not None:
+            attempt_deadline = min(deadline, expires - time.monotonic())
+            if attempt_deadline <= 0:
+                raise DeadlineExceeded(f"{provider} call budget of {budget:.1f}s spent")
+        try:
+            result = call_with_deadline(provider, fn, attempt_deadline, *args, **kwargs)
+            breaker.record_success()
+            return result
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            breaker.record_failure()
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt, policy["base_delay"], policy["max_delay"])
+            if expires is not None and time.monotonic() + delay >= expires:
+                raise
+            print(f"🔁 {provider} call failed ({e}); retry {attempt + 1}/{retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def hedged_call(name, fn, *args, **kwargs):
+    """
+    Run `fn`, and if it is still pending after the observed p95 latency for
+    `name`, launch one duplicate and return whichever succeeds first. No
+    duplicate is sent until enough samples exist to estimate the p95.
+    """
+    tracker = LATENCIES.setdefault(name, LatencyTracker())
+    hedge_after = tracker.p95()
+    start = time.perf_counter()
+
+    primary = _hedge_executor.submit(fn, *args, **kwargs)
+    pending = {primary}
+    if hedge_after is not None:
+        done, _ = wait([primary], timeout=hedge_after)
+        if not done:
+            print(f"🪞 {name} slower than p95 {hedge_after:.2f}s, sending hedged request")
+            pending.add(_hedge_executor.submit(fn, *args, **kwargs))
+
+    last_error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            tracker.record(time.perf_counter() - start)
+            for other in pending:
+                other.cancel()
+            return result
+    raise last_error
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking resilient call without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
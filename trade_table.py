@@ -0,0 +1,199 @@
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from ledger import TradeLedger, normalize_channel
+from analytics import CONFIG
+
+# -------- Configuration --------
+DAY_NAMES = np.array(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"])
+TIER_NAMES = {CONFIG["channels"][tier]: CONFIG["channel_names"][tier] for tier in CONFIG["channels"]}
+# Upper edges in minutes for the hold-time histogram
+HOLD_BUCKETS = [5, 15, 30, 60, 240, 1440, 7 * 1440]
+HOLD_LABELS = ["≤5m", "≤15m", "≤30m", "≤1h", "≤4h", "≤1d", "≤1w", ">1w"]
+GROUP_BY = ("tier", "ticker", "weekday")
+MAX_ROWS = 20
+
+
+class TradeTable:
+    """
+    Column-per-field view of closed ledger trades.
+
+    Categorical fields (tier, ticker) are stored as integer codes into a
+    names array so group-bys reduce to np.bincount over the codes.
+    """
+
+    def __init__(self, columns, tier_names, ticker_names):
+        self.tier = columns["tier"]
+        self.ticker = columns["ticker"]
+        self.weekday = columns["weekday"]
+        self.entry = columns["entry"]
+        self.exit = columns["exit"]
+        self.pct = columns["pct"]
+        self.pnl = columns["pnl"]
+        self.hold = columns["hold"]
+        self.exit_time = columns["exit_time"]
+        self.tier_names = tier_names
+        self.ticker_names = ticker_names
+
+    def __len__(self):
+        return len(self.entry)
+
+    @classmethod
+    def from_trades(cls, trades):
+        """Build from closed ledger trade dicts; open runners and trades without exits or an entry price are skipped."""
+        # Same filter as backtest.build_events, so !stats and the backtest count the same trades
+        rows = [t for t in trades if t["status"] == "closed" and t["exits"] and t["entry"]]
+        n = len(rows)
+        entry = np.fromiter((t["entry"] for t in rows), dtype=np.float64, count=n)
+        exit_avg = np.fromiter(
+            (sum(e["price"] for e in t["exits"]) / len(t["exits"]) for t in rows), dtype=np.float64, count=n
+        )
+        entry_time = np.array([t["entry_time"].replace(" ", "T") for t in rows], dtype="datetime64[m]")
+        exit_time = np.array([t["exits"][-1]["exit_time"].replace(" ", "T") for t in rows], dtype="datetime64[m]")
+        tier_names, tier_codes = np.unique(
+            np.array([TIER_NAMES.get(normalize_channel(t["channel"]), t["channel"]) for t in rows], dtype=object),
+            return_inverse=True
+        )
+        ticker_names, ticker_codes = np.unique(np.array([t["ticker"] for t in rows], dtype=object), return_inverse=True)
+
+        columns = {
+            "tier": tier_codes.astype(np.int32),
+            "ticker": ticker_codes.astype(np.int32),
+            # 1970-01-01 was a Thursday, so shift day numbers to make Monday 0
+            "weekday": ((entry_time.astype("datetime64[D]").astype(np.int64) + 3) % 7).astype(np.int8),
+            "entry": entry,
+            "exit": exit_avg,
+            "pct": (exit_avg - entry) / entry * 100,
+            # One contract is 100 shares
+            "pnl": (exit_avg - entry) * 100,
+            "hold": (exit_time - entry_time).astype(np.float64),
+            "exit_time": exit_time,
+        }
+        return cls(columns, tier_names, ticker_names)
+
+    def since(self, start):
+        """Trades whose last exit is at or after `start` (a datetime)."""
+        mask = self.exit_time >= np.datetime64(start.strftime("%Y-%m-%dT%H:%M"), "m")
+        columns = {
+            name: getattr(self, name)[mask]
+            for name in ("tier", "ticker", "weekday", "entry", "exit", "pct", "pnl", "hold", "exit_time")
+        }
+        return TradeTable(columns, self.tier_names, self.ticker_names)
+
+    def _codes(self, by):
+        if by == "tier":
+            return self.tier, self.tier_names
+        if by == "ticker":
+            return self.ticker, self.ticker_names
+        if by == "weekday":
+            return self.weekday.astype(np.int32), DAY_NAMES
+        raise ValueError(f"cannot group by {by!r}")
+
+    def group_stats(self, by):
+        """Per-group count, win rate, average and entry-weighted percent, P&L and median hold."""
+        codes, names = self._codes(by)
+        size = len(names)
+        count = np.bincount(codes, minlength=size)
+        wins = np.bincount(codes, weights=(self.pct > 0), minlength=size)
+        pct_sum = np.bincount(codes, weights=self.pct, minlength=size)
+        weighted_sum = np.bincount(codes, weights=self.pct * self.entry, minlength=size)
+        entry_sum = np.bincount(codes, weights=self.entry, minlength=size)
+        pnl = np.bincount(codes, weights=self.pnl, minlength=size)
+
+        # Medians: sort holds within each group, then index the middle of each run
+        order = np.lexsort((self.hold, codes))
+        sorted_hold = self.hold[order]
+        starts = np.concatenate(([0], np.cumsum(count)[:-1]))
+        lo = starts + (count - 1) // 2
+        hi = starts + count // 2
+        present = count > 0
+        median_hold = np.zeros(size)
+        median_hold[present] = (sorted_hold[lo[present]] + sorted_hold[hi[present]]) / 2
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            stats = {
+                "name": names,
+                "count": count,
+                "wins": wins.astype(np.int64),
+                "win_rate": np.where(present, wins / count * 100, 0.0),
+                "avg_pct": np.where(present, pct_sum / count, 0.0),
+                "weighted_pct": np.where(entry_sum > 0, weighted_sum / entry_sum, 0.0),
+                "pnl": pnl,
+                "median_hold": median_hold,
+            }
+        keep = np.flatnonzero(present)
+        return {key: value[keep] for key, value in stats.items()}
+
+    def hold_distribution(self):
+        """Trade counts per HOLD_LABELS bucket."""
+        return np.bincount(np.searchsorted(HOLD_BUCKETS, self.hold, side="left"), minlength=len(HOLD_LABELS))
+
+    def equity_curve(self):
+        """(exit times, cumulative P&L, drawdown from running peak) in exit order, one contract per trade."""
+        order = np.argsort(self.exit_time, kind="stable")
+        equity = np.cumsum(self.pnl[order])
+        peak = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:]
+        return self.exit_time[order], equity, equity - peak
+
+
+def load_trade_table(ledger_file):
+    ledger = TradeLedger(ledger_file)
+    try:
+        return TradeTable.from_trades(ledger.all_trades())
+    finally:
+        ledger.close()
+
+
+def format_minutes(minutes):
+    if minutes >= 1440:
+        return f"{minutes / 1440:.1f}d"
+    if minutes >= 60:
+        return f"{minutes / 60:.1f}h"
+    return f"{int(minutes)}m"
+
+
+def build_stats_message(ledger_file, by="tier", period="all", now=None):
+    """Text for `!stats [tier|ticker|weekday] [all|month|week]`."""
+    started = time.perf_counter()
+    now = now or datetime.now()
+    table = load_trade_table(ledger_file)
+    if period == "week":
+        table = table.since((now - timedelta(days=now.weekday())).replace(hour=0, minute=0))
+    elif period == "month":
+        table = table.since(now.replace(day=1, hour=0, minute=0))
+    if not len(table):
+        return f"📭 No closed trades in the ledger for `{period}`."
+
+    stats = table.group_stats(by)
+    times, equity, drawdown = table.equity_curve()
+    total_wins = int((table.pct > 0).sum())
+
+    lines = [
+        f"**Trade Stats by {by} ({period})**",
+        f"Trades: {len(table)} | Win rate: {total_wins / len(table) * 100:.1f}% | "
+        f"P&L (1 contract each): ${equity[-1]:,.0f} | Max drawdown: ${-drawdown.min():,.0f}",
+        "",
+        "```",
+        f"{by.title():<8} {'Trades':>6} {'Win%':>6} {'Avg%':>7} {'Wtd%':>7} {'P&L $':>8} {'Med hold':>9}",
+    ]
+    # Largest groups first, capped to stay under Discord's 2000 character limit
+    ranked = np.argsort(-stats["count"], kind="stable")
+    for i in ranked[:MAX_ROWS]:
+        lines.append(
+            f"{str(stats['name'][i])[:8]:<8} {stats['count'][i]:>6} {stats['win_rate'][i]:>6.1f} "
+            f"{stats['avg_pct'][i]:>7.2f} {stats['weighted_pct'][i]:>7.2f} {stats['pnl'][i]:>8.0f} "
+            f"{format_minutes(stats['median_hold'][i]):>9}"
+        )
+    if len(ranked) > MAX_ROWS:
+        lines.append(f"... {len(ranked) - MAX_ROWS} smaller groups not shown")
+    lines.append("```")
+
+    distribution = table.hold_distribution()
+    lines.append("Hold times: " + ", ".join(
+        f"{label} {count}" for label, count in zip(HOLD_LABELS, distribution) if count
+    ))
+    if drawdown.min() < 0:
+        worst = int(np.argmin(drawdown))
+        lines.append(f"Deepest drawdown reached on {str(times[worst]).split('T')[0]}")
+    lines.append(f"_computed in {(time.perf_counter() - started) * 1000:.1f}ms_")
+    return "\n".join(lines)
@@ -0,0 +1,379 @@
+
+
+from time import perf_counter
+PROCESS_START = perf_counter()  # taken before the heavy imports so startup time includes them
+
+import discord
+from discord.ext import commands
+from openai import OpenAI
+import asyncio
+import json
+import statistics
+from datetime import datetime, time, timedelta
+import pytz
+import uuid
+from model_router import routed_completion, strip_code_fences
+from resilience import resilient_call, hedged_call, run_blocking
+from fanout import load_accounts, fan_out_order, format_fan_out, ping_accounts
+from account_state import AccountState, AlpacaTradeUpdateStream, track_account
+
+# -------- Inline Secrets --------
+DISCORD_TOKEN = ""
+OPENAI_KEY = ""
+ALPACA_API_KEY = ""
+ALPACA_SECRET_KEY = ""
+ALPACA_BASE_URL = "https://paper-api.alpaca.markets"
+OWNER_ID = 1346220314262110258
+
+# -------- Mirrored Accounts --------
+# Every entry signal is sent to all of these at once. `scale` multiplies the
+# signal's quantity per tier ("default" covers unlisted tiers, 0 skips the tier);
+# `rate_per_minute` is that account's own request budget.
+ACCOUNTS = [
+    {
+        "name": "main",
+        "api_key": ALPACA_API_KEY,
+        "secret_key": ALPACA_SECRET_KEY,
+        "base_url": ALPACA_BASE_URL,
+        "scale": {"default": 1.0},
+        "rate_per_minute": 200,
+    },
+]
+
+# Send a duplicate parse request when the first one is slower than the observed p95
+HEDGE_LIVE_PARSE = True
+
+# -------- Warmup Settings --------
+EASTERN = pytz.timezone("US/Eastern")
+WARMUP_TIME = time(9, 20)       # ET, ahead of the 9:30 open
+MARKET_CLOSE = time(16, 0)
+KEEPALIVE_SECONDS = 45          # below typical idle timeouts on provider load balancers
+
+# -------- Channels to Listen In --------
+# Channel ID → tier, used to pick each account's quantity scale
+CHANNEL_TIERS = {
+    1379132006629118113: "1",
+    1379132047783624717: "2"
+}
+ALLOWED_CHANNEL_IDS = list(CHANNEL_TIERS)
+
+# -------- API Clients --------
+# Retries are owned by resilience.py, so the SDK's own retry loop is disabled
+client = OpenAI(api_key=OPENAI_KEY, max_retries=0)
+accounts = load_accounts(ACCOUNTS)
+alpaca = accounts[0].client  # used for warmup and market clock calls
+
+# -------- Account State --------
+# Positions and open orders per account, kept current from trade_updates so exits need no REST call
+account_states = {account.name: AccountState(account.name) for account in accounts}
+trade_streams = {
+    config["name"]: AlpacaTradeUpdateStream(config["api_key"], config["secret_key"], config["base_url"])
+    for config in ACCOUNTS
+}
+
+# -------- Discord Bot Setup --------
+intents = discord.Intents.default()
+intents.message_content = True
+bot = commands.Bot(command_prefix="!", intents=intents)
+
+# -------- Warm State --------
+owner_dm = None
+background_started = False
+signal_latency = {"date": None, "samples": []}
+
+# -------- Market Time Check --------
+def is_market_open():
+    now_et = datetime.now(EASTERN).time()
+    return time(9, 30) <= now_et <= MARKET_CLOSE
+
+# -------- GPT Parser --------
+def validate_signal(content):
+    parsed = json.loads(strip_code_fences(content))
+    if parsed is None:
+        return None
+    if not isinstance(parsed, dict):
+        raise ValueError("reply is not a JSON object")
+    if parsed.get("action") not in ("entry", "exit"):
+        raise ValueError(f"unknown action {parsed.get('action')!r}")
+    if not parsed.get("ticker"):
+        raise ValueError("missing ticker")
+    return parsed
+
+async def parse_with_gpt(message: str):
+    today = datetime.now().strftime("%m/%d/%Y")
+    prompt = f"""
+Today is {today}.
+
+Extract this trading message into a JSON object.
+
+Message:
+\"{message}\"
+
+Expected format:
+
+{{
+  "action": "entry",
+  "asset_type": "stock",
+  "ticker": "AAPL",
+  "side": "buy",
+  "quantity": 1,
+  "price": float or null
+}}
+
+Exit:
+{{
+  "action": "exit",
+  "asset_type": "stock",
+  "ticker": "AAPL",
+  "exit_price": float
+}}
+
+- Ignore messages that only mention a price target or SL.
+- Set "asset_type" to "option" for entries and exits of calls or puts.
+- Return null if the message is not a valid stock trading signal.
+"""
+    messages = [
+        {"role": "system", "content": "You are a trading assistant that parses messages into structured JSON."},
+        {"role": "user", "content": prompt}
+    ]
+    try:
+        if HEDGE_LIVE_PARSE:
+            return await run_blocking(
+                hedged_call, "live_parse", routed_completion, client, "live_parse",
+                messages=messages, input_text=message, validate=validate_signal
+            )
+        return await run_blocking(
+            routed_completion, client, "live_parse",
+            messages=messages, input_text=message, validate=validate_signal
+        )
+    except Exception as e:
+        print(f"❌ OpenAI error: {e}")
+        return None
+
+# -------- Warmup --------
+async def ping_providers(openai_call, alpaca_call):
+    """Make one cheap authenticated call per provider, returning (name, ms or error) pairs."""
+    results = []
+    for name, provider, fn in (("OpenAI", "openai", openai_call), ("Alpaca", "alpaca", alpaca_call)):
+        start = perf_counter()
+        try:
+            await run_blocking(resilient_call, provider, fn)
+            results.append((name, f"{int((perf_counter() - start) * 1000)}ms"))
+        except Exception as e:
+            results.append((name, f"failed ({e})"))
+    return results
+
+async def start_account_tracking():
+    """Seed every account's state once from REST and follow its trade updates from then on."""
+    async def start(account):
+        try:
+            await track_account(
+                account_states[account.name],
+                trade_streams[account.name],
+                lambda: account.call(account.client.list_positions),
+                lambda: account.call(account.client.list_orders, status="open"),
+                # Recent closed orders give the shares our signals still hold
+                lambda: account.call(account.client.list_orders, status="closed", limit=500)
+            )
+        except Exception as e:
+            print(f"❌ Could not load account state for {account.name}: {e}")
+    await asyncio.gather(*(start(account) for account in accounts))
+
+def record_submitted_orders(results):
+    """Track our own orders right away so a second exit can't sell the same shares before the stream catches up."""
+    for r in results:
+        if r["order"] is not None:
+            account_states[r["account"]].apply("new", r["order"])
+
+async def get_owner_dm():
+    global owner_dm
+    if owner_dm is None:
+        user = await bot.fetch_user(OWNER_ID)
+        owner_dm = user.dm_channel or await user.create_dm()
+    return owner_dm
+
+async def warmup():
+    """Open provider connections, resolve the owner DM and preload parser state before the open."""
+    global owner_dm
+    start = perf_counter()
+
+    # Resolving the completions resource and the timezone up front keeps them off the first signal
+    _ = client.chat.completions
+    datetime.now(EASTERN)
+
+    # models.list and get_account are cheap, authenticated, and open the pooled TLS connections
+    results = await ping_providers(client.models.list, alpaca.get_account)
+    results += await ping_accounts(accounts[1:])
+
+    try:
+        owner_dm = None
+        await get_owner_dm()
+        results.append(("Owner DM", "cached"))
+    except Exception as e:
+        results.append(("Owner DM", f"failed ({e})"))
+
+    signal_latency["date"] = datetime.now(EASTERN).date()
+    signal_latency["samples"] = []
+
+    status = ", ".join(f"{name} {result}" for name, result in results)
+    print(f"🔥 Warmup finished in {int((perf_counter() - start) * 1000)}ms: {status}")
+
+async def warmup_scheduler():
+    """Re-run warmup every weekday at WARMUP_TIME so overnight-idle connections are fresh."""
+    while True:
+        now = datetime.now(EASTERN)
+        target = EASTERN.localize(datetime.combine(now.date(), WARMUP_TIME))
+        if target <= now:
+            target += timedelta(days=1)
+        await asyncio.sleep((target - now).total_seconds())
+        if target.weekday() < 5:
+            await warmup()
+
+async def keepalive_loop():
+    """Keep pooled provider connections open through the trading session."""
+    while True:
+        await asyncio.sleep(KEEPALIVE_SECONDS)
+        now_et = datetime.now(EASTERN).time()
+        if WARMUP_TIME <= now_et <= MARKET_CLOSE:
+            await asyncio.gather(
+                ping_providers(client.models.list, alpaca.get_clock),
+                ping_accounts(accounts[1:], "get_clock")
+            )
+
+def record_signal_latency(started):
+    """Print how long a signal took to handle, flagging the first one of the day."""
+    elapsed_ms = int((perf_counter() - started) * 1000)
+    today = datetime.now(EASTERN).date()
+    if signal_latency["date"] != today:
+        signal_latency["date"] = today
+        signal_latency["samples"] = []
+    samples = signal_latency["samples"]
+    samples.append(elapsed_ms)
+    if len(samples) == 1:
+        print(f"⏱️ First signal of the day handled in {elapsed_ms}ms")
+    else:
+        print(f"⏱️ Signal handled in {elapsed_ms}ms (first {samples[0]}ms, median {int(statistics.median(samples))}ms over {len(samples)})")
+
+# -------- Message Handler --------
+@bot.event
+async def on_ready():
+    global background_started
+    print(f"✅ Logged in as {bot.user} ({int((perf_counter() - PROCESS_START) * 1000)}ms after start)")
+
+    # on_ready fires again on every reconnect, so only start the loops once
+    if background_started:
+        return
+    background_started = True
+    await asyncio.gather(warmup(), start_account_tracking())
+    print(f"🚀 Ready to trade {int((perf_counter() - PROCESS_START) * 1000)}ms after start")
+    asyncio.create_task(warmup_scheduler())
+    asyncio.create_task(keepalive_loop())
+
+@bot.event
+async def on_message(message):
+    if message.author == bot.user:
+        return
+    if message.channel.id not in ALLOWED_CHANNEL_IDS:
+        return
+
+    started = perf_counter()
+    parsed = await parse_with_gpt(message.content)
+    if not parsed:
+        return
+
+    print(f"📡 Parsed signal: {parsed}")
+
+    if parsed.get("action") == "entry" and parsed.get("asset_type") == "stock":
+        ticker = parsed["ticker"]
+        qty = parsed.get("quantity") or 1  # the model may send "quantity": null
+        side = parsed.get("side", "buy")
+        price = parsed.get("price")
+
+        # ⏰ Market time check
+        if not is_market_open():
+            print("⏰ Market is closed. Skipping order.")
+            return
+
+        # 🛒 Submit the stock order to every account concurrently
+        order_start = perf_counter()
+        tier = CHANNEL_TIERS[message.channel.id]
+        results = await fan_out_order(
+            accounts,
+            uuid.uuid4().hex[:16],
+            ticker,
+            side,
+            {account.name: account.quantity(qty, tier) for account in accounts},
+            type="market",
+            time_in_force="gtc"
+        )
+        record_submitted_orders(results)
+        order_report = format_fan_out(ticker, side, results, int((perf_counter() - order_start) * 1000))
+        print(order_report)
+        record_signal_latency(started)
+
+        # 📬 DM the owner
+        try:
+            dm = await get_owner_dm()
+            msg = f"New Entry Signal: {ticker} {side}"
+            if price:
+                msg += f" at ${price} per share"
+            msg += f"\n{order_report}"
+            await dm.send(msg)
+        except Exception as e:
+            print(f"❌ Failed to DM: {e}")
+
+    # Option exits share these channels; only stock exits map to shares we bought
+    elif parsed.get("action") == "exit" and parsed.get("asset_type") == "stock":
+        ticker = parsed["ticker"].upper()
+        exit_price = parsed.get("exit_price")
+
+        if not is_market_open():
+            print("⏰ Market is closed. Skipping exit.")
+            return
+
+        # 💸 Sell the shares our signal orders bought that each account still holds, sized from local state
+        unseeded = [name for name, state in account_states.items() if not state.seeded]
+        if unseeded:
+            print(f"⚠️ No account state yet for {', '.join(unseeded)}; skipping them for this exit")
+        quantities = {name: state.exit_quantity(ticker) for name, state in account_states.items() if state.seeded}
+        if not any(quantities.values()):
+            print(f"🤷 Exit signal for {ticker}, but no account holds it")
+            record_signal_latency(started)
+            return
+
+        order_start = perf_counter()
+        results = await fan_out_order(
+            accounts,
+            uuid.uuid4().hex[:16],
+            ticker,
+            "sell",
+            quantities,
+            type="market",
+            time_in_force="gtc"
+        )
+        record_submitted_orders(results)
+        order_report = format_fan_out(ticker, "sell", results, int((perf_counter() - order_start) * 1000))
+        print(order_report)
+        record_signal_latency(started)
+
+        try:
+            dm = await get_owner_dm()
+            msg = f"New Exit Signal: {ticker}"
+            if exit_price:
+                msg += f" at ${exit_price} per share"
+            msg += f"\n{order_report}"
+            await dm.send(msg)
+        except Exception as e:
+            print(f"❌ Failed to DM: {e}")
+
+    await bot.process_commands(message)
+
+# -------- Command --------
+@bot.command()
+async def ping(ctx):
+    await ctx.send("🏓 Pong!")
+
+# -------- Run --------
+# Guarded so importing this module never starts a second bot
+if __name__ == "__main__":
+    bot.run(DISCORD_TOKEN)
\ No newline at end of file